@@ -1,5 +1,7 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pathlib import Path
+from typing import Literal, Optional
+import asyncio
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 
 
@@ -13,13 +15,127 @@ class Settings(BaseSettings):
     DB_NAME: str
     SECRET_KEY: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 30
+
+    MONGODB_MAX_POOL_SIZE: int = 100
+    MONGODB_MIN_POOL_SIZE: int = 0
+    MONGODB_MAX_IDLE_TIME_MS: Optional[int] = None
+    MONGODB_WAIT_QUEUE_TIMEOUT_MS: Optional[int] = None
+    MONGODB_COMPRESSORS: Optional[str] = None
+    MONGODB_WARMUP_CONNECTIONS: int = 0
+
+    JWT_STATELESS_CLAIMS: bool = False
+    JWT_CLAIMS_MAX_STALENESS_SECONDS: int = 60
+    JWT_DECODE_CACHE_SIZE: int = 10000
+    JWT_ALGORITHM: str = "HS256"
+    JWT_KEYS_DIR: Optional[Path] = None
+    JWT_ACTIVE_KID: Optional[str] = None
+    JWKS_MAX_AGE_SECONDS: int = 300
+    INTROSPECTION_MAX_BATCH: int = 100
+
+    SHARED_STORE_URL: Optional[str] = None
+    SHARED_STORE_MAX_SIZE: int = 100000
+
+    USER_CACHE_ENABLED: bool = True
+    USER_CACHE_TTL_SECONDS: float = 30
+
+    USER_LIST_DEFAULT_LIMIT: int = 50
+    USER_LIST_MAX_LIMIT: int = 500
+
+    BULK_IMPORT_BATCH_SIZE: int = 500
+    BULK_EXPORT_BATCH_SIZE: int = 1000
+    BULK_ACTION_BATCH_SIZE: int = 1000
+    BULK_ACTION_MAX_IDS: int = 10000
+
+    USER_WRITE_FLUSH_INTERVAL_MS: int = 1000
+    USER_WRITE_FLUSH_MAX_BATCH: int = 500
+
+    PASSWORD_HASHING_EXECUTOR: Literal["thread", "process"] = "thread"
+    PASSWORD_HASHING_WORKERS: int = 4
+    PASSWORD_HASHING_MAX_QUEUE: int = 64
+    PASSWORD_HASH_SCHEME: Literal["bcrypt", "argon2"] = "bcrypt"
+    PASSWORD_BCRYPT_ROUNDS: int = 12
+    PASSWORD_ARGON2_TIME_COST: int = 3
+    PASSWORD_ARGON2_MEMORY_COST: int = 65536
+    PASSWORD_ARGON2_PARALLELISM: int = 4
+    LOGIN_UNKNOWN_USER_MODE: Literal["hash", "delay"] = "hash"
+
+    PASSWORD_MIN_LENGTH: int = 8
+    PASSWORD_MAX_LENGTH: int = 128
+    PASSWORD_MIN_ZXCVBN_SCORE: Optional[int] = None
+    BREACHED_PASSWORDS_INDEX: Optional[Path] = None
+
+    REVOCATION_BLOOM_CAPACITY: int = 100000
+    REVOCATION_BLOOM_FP_RATE: float = 0.001
+    REVOCATION_REFRESH_SECONDS: float = 5
+
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_WINDOW_SECONDS: int = 60
+    RATE_LIMIT_LOGIN_PER_IP: int = 60
+    RATE_LIMIT_LOGIN_PER_ACCOUNT: int = 20
+    RATE_LIMIT_REGISTER_PER_IP: int = 20
+    RATE_LIMIT_EMAIL_PER_ACCOUNT: int = 5
+    RATE_LIMIT_AUTH_PER_IP: int = 60
+    RATE_LIMIT_MAX_KEYS: int = 100000
+    RATE_LIMIT_TRUSTED_PROXIES: Optional[str] = None
+
+    MAIL_TRANSPORT: Literal["smtp", "file", "memory"] = "smtp"
+    MAIL_FROM: str = "no-reply@example.com"
+    MAIL_FILE_DIRECTORY: Path = Path("mail")
+    MAIL_LINK_BASE_URL: str = "http://localhost:3000"
+    MAIL_BATCH_SIZE: int = 50
+    MAIL_POLL_INTERVAL_SECONDS: float = 5
+    MAIL_MAX_ATTEMPTS: int = 6
+    MAIL_RETRY_BASE_SECONDS: float = 30
+    SMTP_HOST: str = "localhost"
+    SMTP_PORT: int = 587
+    SMTP_USERNAME: Optional[str] = None
+    SMTP_PASSWORD: Optional[str] = None
+    SMTP_STARTTLS: bool = True
+    SMTP_TIMEOUT_SECONDS: float = 10
 
 
 settings = Settings()
 
 
-def get_db() -> AsyncIOMotorDatabase:
-    async_client = AsyncIOMotorClient(settings.MONGODB_URL)
-    async_db = async_client[settings.DB_NAME]
+_client: Optional[AsyncIOMotorClient] = None
+
+
+def get_client() -> AsyncIOMotorClient:
+    """
+    Returns the process-wide Motor client, creating it on first use.
+    """
+    global _client
+
+    if _client is None:
+        options = {
+            "maxPoolSize": settings.MONGODB_MAX_POOL_SIZE,
+            "minPoolSize": settings.MONGODB_MIN_POOL_SIZE,
+            "maxIdleTimeMS": settings.MONGODB_MAX_IDLE_TIME_MS,
+            "waitQueueTimeoutMS": settings.MONGODB_WAIT_QUEUE_TIMEOUT_MS,
+        }
+        if settings.MONGODB_COMPRESSORS:
+            options["compressors"] = settings.MONGODB_COMPRESSORS
+        _client = AsyncIOMotorClient(settings.MONGODB_URL, **options)
+
+    return _client
+
 
-    return async_db
+def close_client() -> None:
+    global _client
+
+    if _client is not None:
+        _client.close()
+        _client = None
+
+
+async def warmup_pool(connections: int) -> None:
+    """
+    Opens up to `connections` pooled connections ahead of the first requests.
+    """
+    db = get_db()
+    await asyncio.gather(*(db.command("ping") for _ in range(connections)))
+
+
+def get_db() -> AsyncIOMotorDatabase:
+    return get_client()[settings.DB_NAME]
@@ -1,20 +1,33 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, status
+from fastapi.responses import JSONResponse
 from beanie import init_beanie
-from app.config.settings import get_db
-from app.users.db import User
+from app.config.settings import close_client, get_db, settings, warmup_pool
+from app.users.db import user_write_buffer
+from app.users.hashing import HashingQueueFull, password_hasher
+from app.users.indexes import document_models
+from app.users.mail import outbox
+from app.users.revocation import revocation_list
 from app.users.router import router as users_router
+from app.users.store import close_store
 from contextlib import asynccontextmanager
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    await init_beanie(
-        database=get_db(),
-        document_models=[
-            User,
-        ],
-    )
+    # also creates any missing index
+    await init_beanie(database=get_db(), document_models=document_models)
+    if settings.MONGODB_WARMUP_CONNECTIONS:
+        await warmup_pool(settings.MONGODB_WARMUP_CONNECTIONS)
+    await revocation_list.start()
+    user_write_buffer.start()
+    outbox.start()
     yield
+    await outbox.stop()
+    await user_write_buffer.stop()
+    await revocation_list.stop()
+    await password_hasher.shutdown()
+    await close_store()
+    close_client()
 
 
 app = FastAPI(
@@ -24,4 +37,13 @@ app = FastAPI(
 )
 
 
+@app.exception_handler(HashingQueueFull)
+async def hashing_queue_full_handler(request: Request, exc: HashingQueueFull):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "HASHING_QUEUE_FULL"},
+        headers={"Retry-After": "1"},
+    )
+
+
 app.include_router(users_router)
@@ -0,0 +1,203 @@
+from pathlib import Path
+from typing import IO, Iterable, Iterator, List, Optional
+import argparse
+import hashlib
+import heapq
+import mmap
+import os
+import struct
+import tempfile
+
+
+MAGIC = b"PWBREACH"
+HEADER = struct.Struct("<8sIQ")
+# 80 bits keep false positives negligible for billions of passwords
+DEFAULT_RECORD_SIZE = 10
+
+
+def password_digest(password: str, record_size: int) -> bytes:
+    return hashlib.sha1(password.encode()).digest()[:record_size]
+
+
+class BreachedPasswordIndex:
+    """
+    Sorted, fixed-width truncated SHA-1 digests of breached passwords,
+    memory-mapped read-only so that every worker shares the page cache.
+    Lookups are a binary search over the mapping.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        with open(self.path, "rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mmap) < HEADER.size:
+            raise ValueError(f"Invalid breached password index: {path}")
+        magic, self.record_size, self.count = HEADER.unpack_from(self._mmap)
+        if (
+            magic != MAGIC
+            or len(self._mmap) != HEADER.size + self.count * self.record_size
+        ):
+            raise ValueError(f"Invalid breached password index: {path}")
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _record(self, index: int) -> bytes:
+        start = HEADER.size + index * self.record_size
+        return self._mmap[start : start + self.record_size]
+
+    def __contains__(self, password: str) -> bool:
+        digest = password_digest(password, self.record_size)
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            record = self._record(middle)
+            if record == digest:
+                return True
+            if record < digest:
+                low = middle + 1
+            else:
+                high = middle
+        return False
+
+    def close(self) -> None:
+        self._mmap.close()
+
+
+def read_digests(
+    lines: Iterable[str], input_format: str, record_size: int, min_count: int
+) -> Iterator[bytes]:
+    """
+    Yields the truncated digest of every password of a corpus, given either
+    as plain passwords or as `SHA1:count` lines of the Pwned Passwords dump.
+    """
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if not line:
+            continue
+        if input_format == "plain":
+            password = line.encode(errors="surrogateescape")
+            yield hashlib.sha1(password).digest()[:record_size]
+            continue
+
+        sha1, _, count = line.partition(":")
+        if count and int(count) < min_count:
+            continue
+        yield bytes.fromhex(sha1)[:record_size]
+
+
+def _write_chunk(records: List[bytes], directory: str) -> IO[bytes]:
+    records.sort()
+    chunk = tempfile.TemporaryFile(dir=directory)
+    chunk.write(b"".join(records))
+    chunk.seek(0)
+    return chunk
+
+
+def _read_chunk(chunk: IO[bytes], record_size: int) -> Iterator[bytes]:
+    while True:
+        record = chunk.read(record_size)
+        if not record:
+            return
+        yield record
+
+
+def build_index(
+    digests: Iterable[bytes],
+    output: Path,
+    record_size: int = DEFAULT_RECORD_SIZE,
+    chunk_records: int = 10_000_000,
+) -> int:
+    """
+    Writes an index of `digests`, sorting them in chunks of `chunk_records`
+    that are merged from disk, and atomically replaces `output` with it.
+
+    :return: The number of distinct records written.
+    """
+    output = Path(output)
+    directory = str(output.parent)
+    chunks: List[IO[bytes]] = []
+    try:
+        records: List[bytes] = []
+        for digest in digests:
+            records.append(digest)
+            if len(records) >= chunk_records:
+                chunks.append(_write_chunk(records, directory))
+                records = []
+        if records:
+            chunks.append(_write_chunk(records, directory))
+
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{output.name}.")
+        try:
+            count = 0
+            with os.fdopen(fd, "wb") as file:
+                file.write(HEADER.pack(MAGIC, record_size, 0))
+                previous = None
+                merged = heapq.merge(
+                    *(_read_chunk(chunk, record_size) for chunk in chunks)
+                )
+                for record in merged:
+                    if record != previous:
+                        file.write(record)
+                        count += 1
+                        previous = record
+                file.seek(0)
+                file.write(HEADER.pack(MAGIC, record_size, count))
+                file.flush()
+                os.fsync(file.fileno())
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, output)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    finally:
+        for chunk in chunks:
+            chunk.close()
+    return count
+
+
+def load_breached_index(path: Optional[Path]) -> Optional[BreachedPasswordIndex]:
+    return BreachedPasswordIndex(path) if path is not None else None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Build or refresh the breached password index."
+    )
+    parser.add_argument("inputs", nargs="+", type=Path, help="Corpus files")
+    parser.add_argument("--output", type=Path, required=True)
+    parser.add_argument(
+        "--format",
+        choices=["sha1", "plain"],
+        default="sha1",
+        help="`SHA1:count` lines, or one plain password per line",
+    )
+    parser.add_argument(
+        "--min-count",
+        type=int,
+        default=1,
+        help="Skip hashes seen fewer times than this in the corpus",
+    )
+    parser.add_argument("--record-size", type=int, default=DEFAULT_RECORD_SIZE)
+    parser.add_argument("--chunk-records", type=int, default=10_000_000)
+    args = parser.parse_args()
+
+    if not 4 <= args.record_size <= 20:
+        parser.error("--record-size must be between 4 and 20 bytes")
+
+    def lines() -> Iterator[str]:
+        for path in args.inputs:
+            with open(path, encoding="utf-8", errors="surrogateescape") as file:
+                yield from file
+
+    count = build_index(
+        read_digests(lines(), args.format, args.record_size, args.min_count),
+        args.output,
+        record_size=args.record_size,
+        chunk_records=args.chunk_records,
+    )
+    print(f"{count} passwords written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
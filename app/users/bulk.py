@@ -0,0 +1,346 @@
+from beanie import init_beanie
+from bson import ObjectId
+from datetime import datetime
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
+from typing import Any, AsyncIterable, AsyncIterator, Dict, List, Optional, Tuple
+from app.config.settings import close_client, get_db, settings
+from .db import User, normalize_email, user_cache_keys
+from .hashing import HashingQueueFull, password_hasher
+from .indexes import document_models
+from .listing import (
+    LISTABLE_FIELDS,
+    InvalidListQuery,
+    json_default,
+    parse_fields,
+    user_item,
+)
+from .policy import password_policy
+from .refresh import refresh_tokens
+from .schemas import BulkAction, UserCreate
+from .store import get_store
+from .strategy import mark_users_changed
+import argparse
+import asyncio
+import csv
+import io
+import json
+import sys
+
+
+EXPORT_FORMATS = ("ndjson", "csv")
+
+# the fields each action sets, None for a delete
+BULK_ACTIONS: Dict[str, Optional[Dict[str, bool]]] = {
+    "deactivate": {"is_active": False},
+    "activate": {"is_active": True},
+    "verify": {"is_verified": True},
+    "unverify": {"is_verified": False},
+    "delete": None,
+}
+# Actions after which users may no longer refresh their sessions. Their
+# access tokens are not revoked: their ids are not recorded when issued, so
+# they cannot be added to the revocation list. This app rejects them on the
+# next request, as the users' claims are marked changed and get reloaded,
+# but a service that only checks signatures against the JWKS accepts them
+# until they expire, at most ACCESS_TOKEN_EXPIRE_MINUTES later.
+REVOKING_ACTIONS = frozenset({"deactivate", "delete"})
+
+
+async def iter_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[bytes]:
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line
+    if buffer:
+        yield buffer
+
+
+def parse_user(line: bytes) -> UserCreate:
+    """
+    Validates one NDJSON line like a registration would.
+
+    :raises ValueError: The line is not a valid user.
+    """
+    try:
+        user = UserCreate.model_validate_json(line)
+    except ValidationError as e:
+        raise ValueError(
+            "; ".join(
+                f"{'.'.join(map(str, error['loc'])) or 'line'}: {error['msg']}"
+                for error in e.errors()
+            )
+        )
+    violations = password_policy.validate(user.password, user)
+    if violations:
+        raise ValueError("; ".join(violations))
+    return user
+
+
+async def _hash(password: str, semaphore: asyncio.Semaphore) -> str:
+    async with semaphore:
+        while True:
+            try:
+                return await password_hasher.hash(password)
+            except HashingQueueFull:
+                # leave the queue to interactive requests
+                await asyncio.sleep(0.05)
+
+
+async def _insert_batch(
+    batch: List[Tuple[int, UserCreate]], semaphore: asyncio.Semaphore
+) -> Tuple[int, List[Dict[str, Any]]]:
+    errors = []
+    existing = set()
+    cursor = User.get_motor_collection().find(
+        {"email": {"$in": [user.email for _, user in batch]}},
+        {"email": 1},
+        collation=User.Settings.email_collation,
+    )
+    async for document in cursor:
+        existing.add(normalize_email(document["email"]))
+
+    pending = []
+    for line, user in batch:
+        email = normalize_email(user.email)
+        if email in existing:
+            errors.append({"line": line, "error": "REGISTER_USER_ALREADY_EXISTS"})
+            continue
+        existing.add(email)
+        pending.append((line, user))
+
+    hashed_passwords = await asyncio.gather(
+        *(_hash(user.password, semaphore) for _, user in pending)
+    )
+    users = []
+    for (_, user_create), hashed_password in zip(pending, hashed_passwords):
+        user_dict = user_create.create_update_dict_superuser()
+        del user_dict["password"]
+        users.append(User(**user_dict, hashed_password=hashed_password))
+    if not users:
+        return 0, errors
+
+    try:
+        await User.insert_many(users, ordered=False)
+    except BulkWriteError as e:
+        for error in e.details["writeErrors"]:
+            errors.append(
+                {
+                    "line": pending[error["index"]][0],
+                    "error": "REGISTER_USER_ALREADY_EXISTS"
+                    if error["code"] == 11000
+                    else error["errmsg"],
+                }
+            )
+        return len(users) - len(e.details["writeErrors"]), errors
+    return len(users), errors
+
+
+async def import_users(
+    lines: AsyncIterable[bytes], batch_size: int = settings.BULK_IMPORT_BATCH_SIZE
+) -> Dict[str, Any]:
+    """
+    Creates a user for every NDJSON line of `UserCreate` fields. Lines are
+    validated as they are read, passwords are hashed on the hashing pool
+    and each batch is inserted unordered, so that one bad line does not
+    stop the others. No registration hooks run for imported users.
+
+    :return: The number of users inserted and the errors by line number.
+    """
+    # at most one job per worker, so that logins still get a slot
+    semaphore = asyncio.Semaphore(password_hasher.workers)
+    inserted = 0
+    errors: List[Dict[str, Any]] = []
+    batch: List[Tuple[int, UserCreate]] = []
+    line_number = 0
+    async for line in lines:
+        line_number += 1
+        if not line.strip():
+            continue
+        try:
+            batch.append((line_number, parse_user(line)))
+        except ValueError as e:
+            errors.append({"line": line_number, "error": str(e)})
+        if len(batch) >= batch_size:
+            count, batch_errors = await _insert_batch(batch, semaphore)
+            inserted += count
+            errors.extend(batch_errors)
+            batch = []
+    if batch:
+        count, batch_errors = await _insert_batch(batch, semaphore)
+        inserted += count
+        errors.extend(batch_errors)
+
+    errors.sort(key=lambda error: error["line"])
+    return {"inserted": inserted, "failed": len(errors), "errors": errors}
+
+
+def _csv_value(value: Any) -> Any:
+    # written like their JSON counterparts
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (ObjectId, datetime)):
+        return json_default(value)
+    return value
+
+
+async def export_users(
+    query: Dict[str, Any],
+    fields: Optional[frozenset],
+    output_format: str,
+    batch_size: int = settings.BULK_EXPORT_BATCH_SIZE,
+) -> AsyncIterator[bytes]:
+    """
+    Streams the users matching `query` as NDJSON or CSV. Documents are read
+    `batch_size` at a time and written out a batch at a time, so memory
+    does not grow with the number of users.
+    """
+    fields = fields or frozenset(LISTABLE_FIELDS)
+    columns = [field for field in LISTABLE_FIELDS if field in fields]
+    cursor = (
+        User.get_motor_collection()
+        .find(query, dict.fromkeys(fields - {"id"}, 1))
+        .batch_size(batch_size)
+    )
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    if output_format == "csv":
+        writer.writerow(columns)
+    rows = 0
+    async for document in cursor:
+        item = user_item(document, fields)
+        if output_format == "csv":
+            writer.writerow([_csv_value(item[column]) for column in columns])
+        else:
+            buffer.write(json.dumps(item, default=json_default))
+            buffer.write("\n")
+        rows += 1
+        if rows % batch_size == 0:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+async def _apply_batch(action: BulkAction, documents: List[Dict[str, Any]]) -> int:
+    collection = User.get_motor_collection()
+    ids = [document["_id"] for document in documents]
+    update = BULK_ACTIONS[action]
+    if update is None:
+        changed = (await collection.delete_many({"_id": {"$in": ids}})).deleted_count
+    else:
+        result = await collection.update_many({"_id": {"$in": ids}}, {"$set": update})
+        changed = result.modified_count
+
+    await get_store().delete_many(
+        [
+            key
+            for document in documents
+            for key in user_cache_keys(document["_id"], document["email"])
+        ]
+    )
+    await mark_users_changed([str(user_id) for user_id in ids])
+    if action in REVOKING_ACTIONS:
+        await refresh_tokens.revoke_users(ids)
+    return changed
+
+
+async def apply_bulk_action(
+    action: BulkAction,
+    query: Dict[str, Any],
+    exclude_id: Optional[Any] = None,
+    batch_size: int = settings.BULK_ACTION_BATCH_SIZE,
+) -> Dict[str, int]:
+    """
+    Applies `action` to the users matching `query`, `batch_size` users at a
+    time, with one `update_many` or `delete_many` per batch. The claims of
+    their tokens stop being trusted, their cached copies are dropped and,
+    when they lose access, their refresh tokens are revoked (but not their
+    access tokens, see `REVOKING_ACTIONS`).
+
+    :param exclude_id: A user left untouched, such as the one acting.
+    :return: How many users matched and how many were changed.
+    """
+    if exclude_id is not None:
+        query = {"$and": [query, {"_id": {"$ne": exclude_id}}]}
+    cursor = (
+        User.get_motor_collection().find(query, {"email": 1}).batch_size(batch_size)
+    )
+
+    matched = modified = 0
+    batch: List[Dict[str, Any]] = []
+    async for document in cursor:
+        batch.append(document)
+        if len(batch) >= batch_size:
+            modified += await _apply_batch(action, batch)
+            matched += len(batch)
+            batch = []
+    if batch:
+        modified += await _apply_batch(action, batch)
+        matched += len(batch)
+    return {"matched": matched, "modified": modified}
+
+
+async def _read_lines(path: str) -> AsyncIterator[bytes]:
+    with sys.stdin.buffer if path == "-" else open(path, "rb") as file:
+        for line in file:
+            yield line
+
+
+async def _run(args: argparse.Namespace) -> int:
+    await init_beanie(database=get_db(), document_models=document_models)
+    if args.command == "import":
+        report = await import_users(_read_lines(args.input), args.batch_size)
+        for error in report["errors"]:
+            print(f"line {error['line']}: {error['error']}", file=sys.stderr)
+        print(f"{report['inserted']} users imported, {report['failed']} failed")
+        return 1 if report["failed"] else 0
+
+    output = sys.stdout.buffer if args.output == "-" else open(args.output, "wb")
+    try:
+        async for chunk in export_users({}, args.fields, args.format, args.batch_size):
+            output.write(chunk)
+    finally:
+        if output is not sys.stdout.buffer:
+            output.close()
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Bulk user import and export.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    import_parser = commands.add_parser("import", help="Create users from NDJSON")
+    import_parser.add_argument("input", help="NDJSON file, or - for stdin")
+    import_parser.add_argument(
+        "--batch-size", type=int, default=settings.BULK_IMPORT_BATCH_SIZE
+    )
+    export_parser = commands.add_parser("export", help="Write users out")
+    export_parser.add_argument("--output", default="-", help="File, or - for stdout")
+    export_parser.add_argument("--format", choices=EXPORT_FORMATS, default="ndjson")
+    export_parser.add_argument("--fields", help="Comma separated fields")
+    export_parser.add_argument(
+        "--batch-size", type=int, default=settings.BULK_EXPORT_BATCH_SIZE
+    )
+    args = parser.parse_args()
+    if args.command == "export":
+        try:
+            args.fields = parse_fields(args.fields)
+        except InvalidListQuery as e:
+            parser.error(str(e))
+
+    try:
+        status = asyncio.run(_run(args))
+    finally:
+        asyncio.run(password_hasher.shutdown())
+        close_client()
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Generic, Hashable, Optional, Tuple, TypeVar
+
+
+V = TypeVar("V")
+
+
+class LRUCache(Generic[V]):
+    """
+    Bounded least-recently-used cache whose entries expire after a TTL.
+
+    :param maxsize: Maximum number of entries kept before evicting.
+    :param ttl: Default lifetime of an entry in seconds.
+    """
+
+    def __init__(self, maxsize: int, ttl: Optional[float] = None) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data: "OrderedDict[Hashable, Tuple[V, Optional[float]]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Optional[V]:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: V, ttl: Optional[float] = None) -> None:
+        if self.maxsize <= 0:
+            return
+
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+
+        self._data[key] = (value, expires_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def incr(self, key: Hashable, amount: int = 1, ttl: Optional[float] = None) -> int:
+        """
+        Increments an integer entry, keeping the expiry of an existing entry.
+        """
+        entry = self._data.get(key)
+        if entry is None or (entry[1] is not None and entry[1] <= time.monotonic()):
+            self.set(key, amount, ttl)
+            return amount
+
+        value, expires_at = entry
+        self._data[key] = (value + amount, expires_at)
+        self._data.move_to_end(key)
+        return value + amount
+
+    def delete(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
@@ -1,9 +1,21 @@
 from beanie import Document
+from collections import Counter
+from fastapi_users import exceptions
 from fastapi_users.db import BeanieBaseUser, BeanieUserDatabase
+from pydantic import BaseModel
 from pydantic.fields import Field
-from typing import cast, Type
+from pymongo import ASCENDING, DESCENDING, IndexModel, ReturnDocument, UpdateOne
+from typing import Any, Dict, Optional, Tuple, TypeVar, cast, Type
 from fastapi_users_db_beanie import UP_BEANIE
 from datetime import datetime
+from app.config.settings import settings
+from .store import SharedStore, get_store
+import asyncio
+import json
+import logging
+
+
+logger = logging.getLogger(__name__)
 
 
 class User(BeanieBaseUser, Document):
@@ -12,6 +24,334 @@ class User(BeanieBaseUser, Document):
     created_at: datetime = Field(default_factory=datetime.utcnow)
     last_login: datetime | None = Field(default=None)
 
+    class Settings(BeanieBaseUser.Settings):
+        indexes = BeanieBaseUser.Settings.indexes + [
+            # listing users in creation order, with a stable tie-breaker
+            IndexModel(
+                [("created_at", ASCENDING), ("_id", ASCENDING)], name="created_at"
+            ),
+            IndexModel(
+                [
+                    ("is_active", ASCENDING),
+                    ("is_verified", ASCENDING),
+                    ("created_at", ASCENDING),
+                    ("_id", ASCENDING),
+                ],
+                name="status_created_at",
+            ),
+            IndexModel(
+                [("created_at", ASCENDING)],
+                name="unverified_created_at",
+                partialFilterExpression={"is_verified": False},
+            ),
+            IndexModel([("last_login", DESCENDING)], name="last_login"),
+            IndexModel(
+                [
+                    ("oauth_accounts.oauth_name", ASCENDING),
+                    ("oauth_accounts.account_id", ASCENDING),
+                ],
+                name="oauth_account",
+                sparse=True,
+            ),
+        ]
+
+
+def normalize_email(email: str) -> str:
+    # emails are matched with a case-insensitive collation
+    return email.lower()
+
+
+# Projections whose users are cached on their own, by model name, so that
+# invalidating a user drops them too.
+CACHED_PROJECTIONS = ("UserAuth", "UserRead")
+
+
+def user_cache_keys(user_id: Any, email: Optional[str] = None) -> list[str]:
+    keys = [f"user:id:{user_id}"]
+    keys.extend(f"user:id:{user_id}:{name}" for name in CACHED_PROJECTIONS)
+    if email is not None:
+        keys.append(f"user:email:{normalize_email(email)}")
+    return keys
+
+
+user_cache_stats: Counter = Counter()
+
+# Stands in for the password hash of users read without it. It is not a
+# valid hash, so verifying a password against it fails loudly.
+UNLOADED_PASSWORD_HASH = ""
+
+P = TypeVar("P", bound=BaseModel)
+
+
+def projection(model: Type[BaseModel]) -> Dict[str, int]:
+    return {field: 1 for field in model.model_fields if field != "id"}
+
+
+class UserDatabase(BeanieUserDatabase[UP_BEANIE]):
+    """
+    Beanie user database that can also read a projection of a user, for
+    callers that only need some of its fields.
+    """
+
+    async def get_full(self, id: Any) -> Optional[UP_BEANIE]:
+        """
+        Loads a user from MongoDB, bypassing any cache, with its password
+        hash. For the paths that check or replace the password.
+        """
+        return await BeanieUserDatabase.get(self, id)
+
+    async def get_full_by_email(self, email: str) -> Optional[UP_BEANIE]:
+        return await BeanieUserDatabase.get_by_email(self, email)
+
+    async def get_projected(self, id: Any, model: Type[P]) -> Optional[P]:
+        """
+        Returns the fields of `model` of a user, loading nothing else.
+        """
+        document = await self.user_model.get_motor_collection().find_one(
+            {"_id": id}, projection(model)
+        )
+        if document is None:
+            return None
+        document["id"] = document.pop("_id")
+        return model.model_validate(document)
+
+    async def update(self, user: UP_BEANIE, update_dict: Dict[str, Any]) -> UP_BEANIE:
+        """
+        Sets only the updated fields, atomically, and refreshes `user` with
+        the stored document, so that concurrent writes to other fields are
+        neither lost nor overwritten with stale values.
+        """
+        if not update_dict:
+            return user
+
+        document = await self.user_model.get_motor_collection().find_one_and_update(
+            {"_id": user.id},
+            {"$set": update_dict},
+            projection={"hashed_password": 0},
+            return_document=ReturnDocument.AFTER,
+        )
+        if document is None:
+            raise exceptions.UserNotExists()
+
+        document.pop("_id")
+        document["hashed_password"] = update_dict.get(
+            "hashed_password", user.hashed_password
+        )
+        for field, value in document.items():
+            if field in self.user_model.model_fields:
+                setattr(user, field, value)
+        return user
+
+
+class CachedUserDatabase(UserDatabase[UP_BEANIE]):
+    """
+    Beanie user database that keeps recently read users in the shared store
+    for a TTL, keyed by id and by normalized email. Writes refresh the
+    cached entries.
+
+    Password hashes are never read for or written to the cache: users it
+    returns have `UNLOADED_PASSWORD_HASH` instead, and the paths that need
+    the hash load the user with `get_full`.
+    """
+
+    def __init__(
+        self,
+        user_model: Type[UP_BEANIE],
+        store: SharedStore,
+        ttl: Optional[float] = None,
+        **kwargs,
+    ):
+        super().__init__(user_model, **kwargs)
+        self.store = store
+        self.ttl = ttl
+
+    async def _get_cached(self, key: str) -> Optional[UP_BEANIE]:
+        cached = await self.store.get(key)
+        if cached is None:
+            user_cache_stats["misses"] += 1
+            return None
+        user_cache_stats["hits"] += 1
+        data = json.loads(cached)
+        data["hashed_password"] = UNLOADED_PASSWORD_HASH
+        return self.user_model.model_validate(data)
+
+    async def _find_one(
+        self, query: Dict[str, Any], **kwargs: Any
+    ) -> Optional[UP_BEANIE]:
+        document = await self.user_model.get_motor_collection().find_one(
+            query, {"hashed_password": 0}, **kwargs
+        )
+        if document is None:
+            return None
+        document["hashed_password"] = UNLOADED_PASSWORD_HASH
+        user = self.user_model.model_validate(document)
+        await self._cache_user(user)
+        return user
+
+    async def _cache_user(self, user: UP_BEANIE) -> None:
+        data = user.model_dump_json(exclude={"hashed_password"})
+        keys = user_cache_keys(user.id, user.email)
+        await self.store.set_many(dict.fromkeys(keys, data), self.ttl)
+
+    async def invalidate(self, user_id: Any, email: Optional[str] = None) -> None:
+        await self.store.delete_many(user_cache_keys(user_id, email))
+
+    async def get(self, id: Any) -> Optional[UP_BEANIE]:
+        user = await self._get_cached(user_cache_keys(id)[0])
+        if user is None:
+            user = await self._find_one({"_id": id})
+        return user
+
+    async def get_projected(self, id: Any, model: Type[P]) -> Optional[P]:
+        # a miss only loads and caches the projected fields; caching a whole
+        # user fills its projected entries too
+        if model.__name__ not in CACHED_PROJECTIONS:
+            return await super().get_projected(id, model)
+        key = f"user:id:{id}:{model.__name__}"
+        cached = await self.store.get(key)
+        if cached is not None:
+            user_cache_stats["hits"] += 1
+            # validated from Python objects so that ids are ObjectIds
+            return model.model_validate(json.loads(cached))
+
+        user_cache_stats["misses"] += 1
+        user = await super().get_projected(id, model)
+        if user is not None:
+            await self.store.set(key, user.model_dump_json(), self.ttl)
+        return user
+
+    async def get_by_email(self, email: str) -> Optional[UP_BEANIE]:
+        user = await self._get_cached(user_cache_keys(None, email)[-1])
+        if user is None:
+            user = await self._find_one(
+                {"email": email}, collation=self.user_model.Settings.email_collation
+            )
+        return user
+
+    async def update(self, user: UP_BEANIE, update_dict: Dict[str, Any]) -> UP_BEANIE:
+        previous_email = user.email
+        updated_user = await super().update(user, update_dict)
+        if normalize_email(previous_email) != normalize_email(updated_user.email):
+            await self.invalidate(user.id, previous_email)
+        await self._cache_user(updated_user)
+        return updated_user
+
+    async def delete(self, user: UP_BEANIE) -> None:
+        await self.invalidate(user.id, user.email)
+        await super().delete(user)
+
+
+class UserWriteBuffer:
+    """
+    Collects field updates that nobody reads synchronously (like last_login)
+    and writes them as one unordered bulk_write of `$set` operations, every
+    `interval` seconds or as soon as `max_batch` users are pending.
+    """
+
+    def __init__(self, interval: float, max_batch: int) -> None:
+        self.interval = interval
+        self.max_batch = max_batch
+        self.pending: Dict[Any, Dict[str, Any]] = {}
+        self.guarded: Dict[Any, Dict[str, Tuple[Any, Any]]] = {}
+        self.emails: Dict[Any, str] = {}
+        self._full: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def _added(self, user: User) -> None:
+        self.emails[user.id] = user.email
+        if len(self.emails) >= self.max_batch and self._full is not None:
+            self._full.set()
+
+    def add(self, user: User, **fields: Any) -> None:
+        self.pending.setdefault(user.id, {}).update(fields)
+        self._added(user)
+
+    def compare_and_set(
+        self, user: User, field: str, expected: Any, value: Any
+    ) -> None:
+        """
+        Buffers a write of `field` that only applies if it still holds
+        `expected` when flushed, so it never overwrites a newer value.
+        """
+        self.guarded.setdefault(user.id, {})[field] = (expected, value)
+        self._added(user)
+
+    async def flush(self) -> int:
+        if not self.emails:
+            return 0
+
+        pending, self.pending = self.pending, {}
+        guarded, self.guarded = self.guarded, {}
+        emails, self.emails = self.emails, {}
+        operations = [
+            UpdateOne({"_id": user_id}, {"$set": fields})
+            for user_id, fields in pending.items()
+        ]
+        operations.extend(
+            UpdateOne({"_id": user_id, field: expected}, {"$set": {field: value}})
+            for user_id, writes in guarded.items()
+            for field, (expected, value) in writes.items()
+        )
+        try:
+            await User.get_motor_collection().bulk_write(operations, ordered=False)
+        except Exception:
+            logger.exception("Failed to flush %d buffered user writes", len(emails))
+            for user_id, fields in pending.items():
+                # keep anything written to the buffer while we were flushing
+                self.pending[user_id] = {**fields, **self.pending.get(user_id, {})}
+            for user_id, writes in guarded.items():
+                self.guarded[user_id] = {**writes, **self.guarded.get(user_id, {})}
+            for user_id, email in emails.items():
+                self.emails.setdefault(user_id, email)
+            return 0
+
+        keys = []
+        for user_id, email in emails.items():
+            keys.extend(user_cache_keys(user_id, email))
+        await get_store().delete_many(keys)
+        return len(operations)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                try:
+                    await asyncio.wait_for(self._full.wait(), timeout=self.interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._full.clear()
+                await self.flush()
+            except Exception:
+                # the writes are kept for the next flush
+                logger.exception("Failed to flush buffered user writes")
+
+    def start(self) -> None:
+        self._full = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._full = None
+        await self.flush()
+
+
+user_write_buffer = UserWriteBuffer(
+    interval=settings.USER_WRITE_FLUSH_INTERVAL_MS / 1000,
+    max_batch=settings.USER_WRITE_FLUSH_MAX_BATCH,
+)
+
 
 async def get_user_db():
-    yield BeanieUserDatabase(cast(Type[UP_BEANIE], User))
+    if settings.USER_CACHE_ENABLED:
+        yield CachedUserDatabase(
+            cast(Type[UP_BEANIE], User),
+            get_store(),
+            ttl=settings.USER_CACHE_TTL_SECONDS,
+        )
+    else:
+        yield UserDatabase(cast(Type[UP_BEANIE], User))
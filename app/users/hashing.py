@@ -0,0 +1,299 @@
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from fastapi_users.password import PasswordHelper
+from passlib.context import CryptContext
+
+from app.config.settings import settings
+
+
+SCHEMES = ("bcrypt", "argon2")
+
+
+def build_crypt_context(
+    scheme: str,
+    bcrypt_rounds: int,
+    argon2_time_cost: int,
+    argon2_memory_cost: int,
+    argon2_parallelism: int,
+) -> CryptContext:
+    """
+    Hashes with `scheme` at exactly the given cost. Hashes made with the
+    other scheme or another cost still verify, but need an update.
+    """
+    return CryptContext(
+        schemes=[scheme] + [other for other in SCHEMES if other != scheme],
+        deprecated="auto",
+        bcrypt__rounds=bcrypt_rounds,
+        bcrypt__min_rounds=bcrypt_rounds,
+        bcrypt__max_rounds=bcrypt_rounds,
+        argon2__rounds=argon2_time_cost,
+        argon2__min_rounds=argon2_time_cost,
+        argon2__max_rounds=argon2_time_cost,
+        argon2__memory_cost=argon2_memory_cost,
+        argon2__parallelism=argon2_parallelism,
+    )
+
+
+password_helper = PasswordHelper(
+    build_crypt_context(
+        scheme=settings.PASSWORD_HASH_SCHEME,
+        bcrypt_rounds=settings.PASSWORD_BCRYPT_ROUNDS,
+        argon2_time_cost=settings.PASSWORD_ARGON2_TIME_COST,
+        argon2_memory_cost=settings.PASSWORD_ARGON2_MEMORY_COST,
+        argon2_parallelism=settings.PASSWORD_ARGON2_PARALLELISM,
+    )
+)
+
+
+def _timed(func: Callable, *args) -> Tuple[Any, float, float]:
+    started = time.monotonic()
+    result = func(*args)
+    return result, started, time.monotonic()
+
+
+def _hash(password: str) -> Tuple[str, float, float]:
+    return _timed(password_helper.hash, password)
+
+
+def _verify_and_update(
+    plain_password: str, hashed_password: str
+) -> Tuple[Tuple[bool, Optional[str]], float, float]:
+    return _timed(password_helper.verify_and_update, plain_password, hashed_password)
+
+
+class HashingQueueFull(Exception):
+    """
+    Raised when the hashing pool already has as many jobs
+    waiting as it is allowed to queue.
+    """
+
+
+class HashingMetrics:
+    def __init__(self) -> None:
+        self.completed = 0
+        self.rejected = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+        self.hash_time_total = 0.0
+        self.hash_time_max = 0.0
+        # of verifications only, which is what logins of unknown users mimic
+        self.verify_latencies: deque = deque(maxlen=100)
+
+    def observe(
+        self, queue_wait: float, hash_time: float, verify: bool = False
+    ) -> None:
+        if verify:
+            self.verify_latencies.append(queue_wait + hash_time)
+        self.completed += 1
+        self.queue_wait_total += queue_wait
+        self.queue_wait_max = max(self.queue_wait_max, queue_wait)
+        self.hash_time_total += hash_time
+        self.hash_time_max = max(self.hash_time_max, hash_time)
+
+    def sample_latency(self) -> Optional[float]:
+        """
+        Returns the latency, queueing included, of one of the recent
+        verifications, so that samples follow their current distribution.
+        """
+        if not self.verify_latencies:
+            return None
+        return random.choice(self.verify_latencies)
+
+    def snapshot(self) -> Dict[str, Any]:
+        completed = self.completed or 1
+        return {
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "queue_wait_avg_ms": self.queue_wait_total / completed * 1000,
+            "queue_wait_max_ms": self.queue_wait_max * 1000,
+            "hash_time_avg_ms": self.hash_time_total / completed * 1000,
+            "hash_time_max_ms": self.hash_time_max * 1000,
+        }
+
+
+class PasswordHasher:
+    """
+    Runs password hashing and verification on a bounded worker pool
+    so that CPU-bound work never blocks the event loop.
+    """
+
+    def __init__(self, executor: str, workers: int, max_queue: int) -> None:
+        self.executor_type = executor
+        self.workers = workers
+        self.max_queue = max_queue
+        self.in_flight = 0
+        self.metrics = HashingMetrics()
+        self._executor: Optional[Executor] = None
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            if self.executor_type == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="password-hasher"
+                )
+        return self._executor
+
+    def _admit(self) -> None:
+        if self.in_flight >= self.workers + self.max_queue:
+            self.metrics.rejected += 1
+            raise HashingQueueFull()
+        self.in_flight += 1
+
+    async def _run(self, func: Callable, *args, verify: bool = False) -> Any:
+        self._admit()
+        submitted = time.monotonic()
+        try:
+            loop = asyncio.get_running_loop()
+            result, started, finished = await loop.run_in_executor(
+                self.executor, func, *args
+            )
+        finally:
+            self.in_flight -= 1
+
+        self.metrics.observe(started - submitted, finished - started, verify)
+        return result
+
+    async def hold(self, delay: float) -> None:
+        """
+        Takes a slot of the pool for `delay` seconds without running
+        anything, admitted or rejected like any job.
+
+        :raises HashingQueueFull: The pool has no slot left.
+        """
+        self._admit()
+        try:
+            await asyncio.sleep(delay)
+        finally:
+            self.in_flight -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(_hash, password)
+
+    async def verify_and_update(
+        self, plain_password: str, hashed_password: str
+    ) -> Tuple[bool, Optional[str]]:
+        return await self._run(
+            _verify_and_update, plain_password, hashed_password, verify=True
+        )
+
+    async def shutdown(self) -> None:
+        """
+        Drops the jobs still queued and waits, off the event loop, for the
+        running ones to finish.
+        """
+        if self._executor is not None:
+            executor, self._executor = self._executor, None
+            await asyncio.to_thread(executor.shutdown, wait=True, cancel_futures=True)
+
+
+password_hasher = PasswordHasher(
+    executor=settings.PASSWORD_HASHING_EXECUTOR,
+    workers=settings.PASSWORD_HASHING_WORKERS,
+    max_queue=settings.PASSWORD_HASHING_MAX_QUEUE,
+)
+
+
+def measure_verify(context: CryptContext, samples: int) -> float:
+    """
+    Returns the median time in seconds to verify a password with `context`.
+    """
+    hashed = context.hash("Calibration#123")
+    timings = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        context.verify("Calibration#123", hashed)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def calibrate(
+    scheme: str,
+    target: float,
+    samples: int,
+    memory_cost: int,
+    parallelism: int,
+) -> Tuple[Dict[str, int], float]:
+    """
+    Raises the time cost of `scheme` until verifying takes longer than
+    `target` seconds, and returns the last cost under it with its timing.
+    """
+    if scheme == "bcrypt":
+        cost, maximum, name = 4, 31, "PASSWORD_BCRYPT_ROUNDS"
+    else:
+        cost, maximum, name = 1, 100, "PASSWORD_ARGON2_TIME_COST"
+
+    minimum = cost
+    best: Optional[Tuple[int, float]] = None
+    while cost <= maximum:
+        context = build_crypt_context(
+            scheme,
+            bcrypt_rounds=cost if scheme == "bcrypt" else 12,
+            argon2_time_cost=cost if scheme == "argon2" else 3,
+            argon2_memory_cost=memory_cost,
+            argon2_parallelism=parallelism,
+        )
+        elapsed = measure_verify(context, samples)
+        print(f"{name}={cost}: {elapsed * 1000:.1f} ms")
+        # the cheapest cost is still suggested when it misses the target
+        if elapsed > target and cost > minimum:
+            break
+        best = (cost, elapsed)
+        if elapsed > target:
+            break
+        cost += 1
+
+    parameters = {name: best[0]}
+    if scheme == "argon2":
+        parameters["PASSWORD_ARGON2_MEMORY_COST"] = memory_cost
+        parameters["PASSWORD_ARGON2_PARALLELISM"] = parallelism
+    return parameters, best[1]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Password hashing tools.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    calibrate_parser = commands.add_parser(
+        "calibrate",
+        help="Suggest hashing parameters for a target verify latency",
+    )
+    calibrate_parser.add_argument(
+        "--scheme", choices=SCHEMES, default=settings.PASSWORD_HASH_SCHEME
+    )
+    calibrate_parser.add_argument("--target-ms", type=float, default=250)
+    calibrate_parser.add_argument("--samples", type=int, default=5)
+    calibrate_parser.add_argument(
+        "--memory-cost",
+        type=int,
+        default=settings.PASSWORD_ARGON2_MEMORY_COST,
+        help="Argon2 memory cost in KiB",
+    )
+    calibrate_parser.add_argument(
+        "--parallelism", type=int, default=settings.PASSWORD_ARGON2_PARALLELISM
+    )
+    args = parser.parse_args()
+
+    parameters, elapsed = calibrate(
+        args.scheme,
+        args.target_ms / 1000,
+        args.samples,
+        args.memory_cost,
+        args.parallelism,
+    )
+    print(f"\nSuggested settings ({elapsed * 1000:.1f} ms per verify):")
+    print(f"PASSWORD_HASH_SCHEME={args.scheme}")
+    for name, value in parameters.items():
+        print(f"{name}={value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+from beanie import Document, init_beanie
+from typing import Dict, List, Sequence, Type
+from app.config.settings import close_client, get_db
+from .db import User
+from .mail import OutboxMessage
+from .refresh import RefreshToken
+from .revocation import RevokedToken
+import argparse
+import asyncio
+
+
+document_models: List[Type[Document]] = [
+    User,
+    RevokedToken,
+    RefreshToken,
+    OutboxMessage,
+]
+
+
+def expected_indexes(document: Type[Document]) -> List[str]:
+    return [index.document["name"] for index in document.Settings.indexes]
+
+
+async def missing_indexes(
+    documents: Sequence[Type[Document]] = document_models,
+) -> Dict[str, List[str]]:
+    """
+    Returns the declared indexes that do not exist, by collection.
+    """
+    missing = {}
+    for document in documents:
+        collection = document.get_motor_collection()
+        existing = await collection.index_information()
+        names = [name for name in expected_indexes(document) if name not in existing]
+        if names:
+            missing[collection.name] = names
+    return missing
+
+
+async def migrate(drop_unknown: bool) -> Dict[str, List[str]]:
+    """
+    Creates every declared index and, with `drop_unknown`, drops the ones
+    that are no longer declared.
+    """
+    await init_beanie(
+        database=get_db(),
+        document_models=document_models,
+        allow_index_dropping=drop_unknown,
+    )
+    return await missing_indexes()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Create the MongoDB indexes.")
+    parser.add_argument(
+        "--drop-unknown",
+        action="store_true",
+        help="Also drop indexes that are not declared on the documents",
+    )
+    args = parser.parse_args()
+
+    try:
+        missing = asyncio.run(migrate(args.drop_unknown))
+    finally:
+        close_client()
+    for document in document_models:
+        collection = document.get_motor_collection().name
+        status = (
+            "missing " + ", ".join(missing[collection])
+            if collection in missing
+            else "ok"
+        )
+        print(f"{collection}: {status}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
+from pathlib import Path
+from typing import Any, Dict, Optional
+from app.config.settings import settings
+import argparse
+import hashlib
+import json
+import jwt
+
+
+class SigningKeys:
+    """
+    Private keys used to sign access tokens, by key id (`kid`).
+
+    Tokens are signed with the active key only; every key stays available
+    for verification and in the JWKS, so that keys can be rotated without
+    invalidating tokens signed with the previous one.
+    """
+
+    def __init__(self, algorithm: str, keys: Dict[str, Any], active_kid: str) -> None:
+        if active_kid not in keys:
+            raise ValueError(f"Unknown active signing key id: {active_kid}")
+        self.algorithm = algorithm
+        self.keys = keys
+        self.active_kid = active_kid
+        self.public_keys = {kid: key.public_key() for kid, key in keys.items()}
+
+    @classmethod
+    def from_directory(
+        cls, algorithm: str, directory: Path, active_kid: Optional[str] = None
+    ) -> "SigningKeys":
+        """
+        Loads every `<kid>.pem` private key of a directory. Without an
+        explicit active key id, the last one in name order signs.
+        """
+        keys = {
+            path.stem: serialization.load_pem_private_key(
+                path.read_bytes(), password=None
+            )
+            for path in sorted(Path(directory).glob("*.pem"))
+        }
+        if not keys:
+            raise ValueError(f"No signing keys found in {directory}")
+        return cls(algorithm, keys, active_kid or list(keys)[-1])
+
+    @property
+    def signing_key(self) -> Any:
+        return self.keys[self.active_kid]
+
+    def verification_key(self, kid: Optional[str]) -> Optional[Any]:
+        return self.public_keys.get(kid) if kid is not None else None
+
+    def jwks(self) -> Dict[str, Any]:
+        algorithm = jwt.get_algorithm_by_name(self.algorithm)
+        keys = []
+        for kid, public_key in self.public_keys.items():
+            jwk = algorithm.to_jwk(public_key, as_dict=True)
+            keys.append({**jwk, "kid": kid, "alg": self.algorithm, "use": "sig"})
+        return {"keys": keys}
+
+
+def load_signing_keys() -> Optional[SigningKeys]:
+    if settings.JWT_ALGORITHM.startswith("HS"):
+        return None
+    if settings.JWT_KEYS_DIR is None:
+        raise ValueError(f"JWT_KEYS_DIR is required for {settings.JWT_ALGORITHM}")
+    return SigningKeys.from_directory(
+        settings.JWT_ALGORITHM, settings.JWT_KEYS_DIR, settings.JWT_ACTIVE_KID
+    )
+
+
+class JWKS:
+    """
+    Pre-rendered JWKS document with its ETag.
+    """
+
+    def __init__(self, signing_keys: Optional[SigningKeys]) -> None:
+        document = signing_keys.jwks() if signing_keys else {"keys": []}
+        self.body = json.dumps(document, separators=(",", ":")).encode()
+        self.etag = f'"{hashlib.sha256(self.body).hexdigest()[:32]}"'
+
+
+def generate_private_key(algorithm: str) -> Any:
+    if algorithm.startswith(("RS", "PS")):
+        return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    if algorithm == "ES256":
+        return ec.generate_private_key(ec.SECP256R1())
+    if algorithm == "ES384":
+        return ec.generate_private_key(ec.SECP384R1())
+    if algorithm == "EdDSA":
+        return ed25519.Ed25519PrivateKey.generate()
+    raise ValueError(f"Unsupported signing algorithm: {algorithm}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate a token signing key.")
+    parser.add_argument("kid", help="Key id, also used as the file name")
+    parser.add_argument("--algorithm", default=settings.JWT_ALGORITHM)
+    parser.add_argument("--directory", type=Path, default=settings.JWT_KEYS_DIR)
+    args = parser.parse_args()
+
+    if args.directory is None:
+        parser.error("--directory is required when JWT_KEYS_DIR is not set")
+
+    key = generate_private_key(args.algorithm)
+    path = Path(args.directory) / f"{args.kid}.pem"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(
+        key.private_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PrivateFormat.PKCS8,
+            encryption_algorithm=serialization.NoEncryption(),
+        )
+    )
+    path.chmod(0o600)
+    print(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from bson import ObjectId
+from bson.errors import InvalidId
+from datetime import datetime
+from pymongo import ASCENDING
+from typing import Any, AsyncIterator, Container, Dict, Optional, Tuple
+from .db import User
+from .schemas import UserRead
+import binascii
+import json
+import re
+
+
+# in output order
+LISTABLE_FIELDS = tuple(UserRead.model_fields)
+
+SORT = [("created_at", ASCENDING), ("_id", ASCENDING)]
+
+
+class InvalidListQuery(ValueError):
+    pass
+
+
+def encode_cursor(created_at: datetime, user_id: ObjectId) -> str:
+    """
+    Opaque cursor pointing just after a user in `(created_at, _id)` order.
+    """
+    data = f"{created_at.isoformat()}|{user_id}".encode()
+    return urlsafe_b64encode(data).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    try:
+        data = urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, _, user_id = data.partition("|")
+        return datetime.fromisoformat(created_at), ObjectId(user_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError, InvalidId):
+        raise InvalidListQuery("Invalid cursor")
+
+
+def parse_fields(fields: Optional[str]) -> Optional[frozenset]:
+    """
+    Parses a comma separated sparse field set. None selects every field.
+    """
+    if not fields:
+        return None
+    selected = frozenset(field.strip() for field in fields.split(",")) - {""}
+    unknown = selected.difference(LISTABLE_FIELDS)
+    if unknown:
+        raise InvalidListQuery(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return selected | {"id"}
+
+
+def build_filter(
+    is_active: Optional[bool] = None,
+    is_verified: Optional[bool] = None,
+    email_prefix: Optional[str] = None,
+    last_login_after: Optional[datetime] = None,
+    last_login_before: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Builds the MongoDB filter of a listing.
+
+    Only `is_active` and `is_verified` narrow the index walk, through the
+    `status_created_at` index. The e-mail prefix is a case-insensitive
+    regex and the `last_login` range is checked on each document in
+    `(created_at, _id)` order. Neither can bound the index scan, so a
+    selective one reads about `limit / selectivity` users per page.
+    """
+    query: Dict[str, Any] = {}
+    if is_active is not None:
+        query["is_active"] = is_active
+    if is_verified is not None:
+        query["is_verified"] = is_verified
+    if email_prefix:
+        # emails match case-insensitively everywhere else
+        query["email"] = {"$regex": f"^{re.escape(email_prefix)}", "$options": "i"}
+    if last_login_after is not None or last_login_before is not None:
+        query["last_login"] = {}
+        if last_login_after is not None:
+            query["last_login"]["$gte"] = last_login_after
+        if last_login_before is not None:
+            query["last_login"]["$lt"] = last_login_before
+    if cursor is not None:
+        created_at, user_id = decode_cursor(cursor)
+        query["$or"] = [
+            {"created_at": {"$gt": created_at}},
+            {"created_at": created_at, "_id": {"$gt": user_id}},
+        ]
+    return query
+
+
+def json_default(value: Any) -> Any:
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def user_item(document: Dict[str, Any], fields: Container[str]) -> Dict[str, Any]:
+    """
+    Returns the selected fields of a user document, in output order.
+    """
+    return {
+        field: document["_id"] if field == "id" else document.get(field)
+        for field in LISTABLE_FIELDS
+        if field in fields
+    }
+
+
+async def stream_users(
+    query: Dict[str, Any], fields: Optional[frozenset], limit: int
+) -> AsyncIterator[bytes]:
+    """
+    Streams a page of users as a JSON object with the `items` and the
+    `next_cursor` of the following page, if any. The page is read from
+    the `(created_at, _id)` index starting at the cursor, so its cost
+    does not grow with how deep the cursor is, though it does with how
+    selective the filters are (see `build_filter`).
+    """
+    fields = fields or frozenset(LISTABLE_FIELDS)
+    # the cursor is built from the last item, whatever fields were selected
+    projection = dict.fromkeys((fields | {"created_at"}) - {"id"}, 1)
+    cursor = (
+        User.get_motor_collection()
+        .find(query, projection)
+        .sort(SORT)
+        .limit(limit + 1)
+        .batch_size(limit + 1)
+    )
+
+    yield b'{"items":['
+    last = None
+    count = 0
+    async for document in cursor:
+        count += 1
+        if count > limit:
+            break
+        if last is not None:
+            yield b","
+        yield json.dumps(user_item(document, fields), default=json_default).encode()
+        last = document
+
+    next_cursor = None
+    if count > limit and last is not None:
+        next_cursor = encode_cursor(last["created_at"], last["_id"])
+    yield b'],"next_cursor":' + json.dumps(next_cursor).encode() + b"}"
@@ -0,0 +1,360 @@
+from abc import ABC, abstractmethod
+from beanie import Document
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from pathlib import Path
+from pydantic.fields import Field
+from pymongo import ASCENDING, IndexModel, UpdateOne
+from string import Template
+from typing import Any, Dict, List, Literal, Optional, Tuple
+from app.config.settings import settings
+import asyncio
+import logging
+import random
+import smtplib
+import uuid
+
+
+logger = logging.getLogger(__name__)
+
+# How long a worker may hold claimed messages before they are due again,
+# in case it died while sending them.
+CLAIM_LEASE = timedelta(minutes=5)
+
+# How long sent and failed messages are kept, for troubleshooting.
+RETENTION = timedelta(days=7)
+
+
+class OutboxMessage(Document):
+    to: str
+    template: str
+    subject: str
+    body: str
+    status: Literal["pending", "sent", "failed"] = "pending"
+    attempts: int = 0
+    next_attempt_at: datetime = Field(default_factory=datetime.utcnow)
+    claim: Optional[str] = None
+    last_error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    sent_at: Optional[datetime] = None
+    expires_at: Optional[datetime] = None
+
+    class Settings:
+        indexes = [
+            IndexModel(
+                [("status", ASCENDING), ("next_attempt_at", ASCENDING)],
+                name="status_next_attempt",
+            ),
+            # MongoDB drops sent and failed messages once they expire
+            IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+        ]
+
+
+class MailTemplate:
+    """
+    A subject and plain text body with `$name` placeholders, parsed once.
+    """
+
+    def __init__(self, subject: str, body: str) -> None:
+        self.subject = Template(subject)
+        self.body = Template(body)
+
+    def render(self, **context: Any) -> Tuple[str, str]:
+        return self.subject.substitute(context), self.body.substitute(context)
+
+
+TEMPLATES = {
+    "verify": MailTemplate(
+        "Verify your e-mail address",
+        "Hi $name,\n\n"
+        "Please confirm your e-mail address by opening this link:\n\n"
+        "$base_url/verify?token=$token\n",
+    ),
+    "forgot_password": MailTemplate(
+        "Reset your password",
+        "Hi $name,\n\n"
+        "Somebody asked to reset your password. If it was you, open this link:\n\n"
+        "$base_url/reset-password?token=$token\n\n"
+        "Otherwise you can ignore this e-mail.\n",
+    ),
+    "reset_password": MailTemplate(
+        "Your password was changed",
+        "Hi $name,\n\n"
+        "Your password was just changed and you were signed out everywhere.\n"
+        "If it was not you, reset your password right away.\n",
+    ),
+}
+
+
+class MailTransport(ABC):
+    @abstractmethod
+    async def send(self, messages: List[EmailMessage]) -> List[Optional[str]]:
+        """
+        Sends a batch of messages and returns, for each of them, the error
+        that prevented sending it or None.
+        """
+
+
+class SMTPTransport(MailTransport):
+    """
+    Sends each batch over a single SMTP connection, from a thread so that
+    the event loop never waits on the mail server.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        starttls: bool = True,
+        timeout: float = 10,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+
+    def _send(self, messages: List[EmailMessage]) -> List[Optional[str]]:
+        try:
+            connection = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        except OSError as e:
+            return [repr(e)] * len(messages)
+
+        errors: List[Optional[str]] = []
+        with connection:
+            try:
+                if self.starttls:
+                    connection.starttls()
+                if self.username is not None:
+                    connection.login(self.username, self.password or "")
+            except (OSError, smtplib.SMTPException) as e:
+                return [repr(e)] * len(messages)
+            for message in messages:
+                try:
+                    connection.send_message(message)
+                    errors.append(None)
+                except (OSError, smtplib.SMTPException) as e:
+                    errors.append(repr(e))
+        return errors
+
+    async def send(self, messages: List[EmailMessage]) -> List[Optional[str]]:
+        return await asyncio.to_thread(self._send, messages)
+
+
+class FileTransport(MailTransport):
+    """
+    Writes every message to an `.eml` file of `directory`, for development.
+    """
+
+    def __init__(self, directory: Path) -> None:
+        self.directory = Path(directory)
+
+    def _write(self, messages: List[EmailMessage]) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for message in messages:
+            path = self.directory / f"{uuid.uuid4().hex}.eml"
+            path.write_bytes(message.as_bytes())
+
+    async def send(self, messages: List[EmailMessage]) -> List[Optional[str]]:
+        await asyncio.to_thread(self._write, messages)
+        return [None] * len(messages)
+
+
+class MemoryTransport(MailTransport):
+    """
+    Keeps every message in `sent`, for tests.
+    """
+
+    def __init__(self) -> None:
+        self.sent: List[EmailMessage] = []
+
+    async def send(self, messages: List[EmailMessage]) -> List[Optional[str]]:
+        self.sent.extend(messages)
+        return [None] * len(messages)
+
+
+def build_transport() -> MailTransport:
+    if settings.MAIL_TRANSPORT == "smtp":
+        return SMTPTransport(
+            settings.SMTP_HOST,
+            settings.SMTP_PORT,
+            username=settings.SMTP_USERNAME,
+            password=settings.SMTP_PASSWORD,
+            starttls=settings.SMTP_STARTTLS,
+            timeout=settings.SMTP_TIMEOUT_SECONDS,
+        )
+    if settings.MAIL_TRANSPORT == "memory":
+        return MemoryTransport()
+    return FileTransport(settings.MAIL_FILE_DIRECTORY)
+
+
+class Outbox:
+    """
+    Queue of e-mails in MongoDB. Request handlers only render and insert
+    messages; a worker claims the due ones in batches, sends each batch
+    through the transport and retries failures with exponential backoff,
+    up to `max_attempts`. Several workers can share the queue.
+
+    Bodies hold links with tokens, so they are blanked as soon as a
+    message is sent or given up on.
+    """
+
+    def __init__(
+        self,
+        transport: MailTransport,
+        sender: str,
+        base_url: str,
+        batch_size: int,
+        poll_interval: float,
+        max_attempts: int,
+        retry_base: float,
+    ) -> None:
+        self.transport = transport
+        self.sender = sender
+        self.base_url = base_url
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def render(self, to: str, template: str, **context: Any) -> OutboxMessage:
+        subject, body = TEMPLATES[template].render(base_url=self.base_url, **context)
+        return OutboxMessage(to=to, template=template, subject=subject, body=body)
+
+    async def enqueue(self, to: str, template: str, **context: Any) -> None:
+        await self.render(to, template, **context).insert()
+        if self._wake is not None:
+            self._wake.set()
+
+    def retry_delay(self, attempts: int) -> float:
+        # jittered so that messages that failed together are retried apart
+        return self.retry_base * 2 ** (attempts - 1) * random.uniform(0.5, 1)
+
+    def email(self, message: OutboxMessage) -> EmailMessage:
+        email = EmailMessage()
+        email["From"] = self.sender
+        email["To"] = message.to
+        email["Subject"] = message.subject
+        email.set_content(message.body)
+        return email
+
+    async def claim(self) -> List[OutboxMessage]:
+        now = datetime.utcnow()
+        due = {"status": "pending", "next_attempt_at": {"$lte": now}}
+        collection = OutboxMessage.get_motor_collection()
+        cursor = (
+            collection.find(due, {"_id": 1})
+            .sort("next_attempt_at", ASCENDING)
+            .limit(self.batch_size)
+        )
+        ids = [document["_id"] async for document in cursor]
+        if not ids:
+            return []
+
+        claim = uuid.uuid4().hex
+        await collection.update_many(
+            {"_id": {"$in": ids}, **due},
+            {"$set": {"claim": claim, "next_attempt_at": now + CLAIM_LEASE}},
+        )
+        # another worker may have claimed some of them first
+        return await OutboxMessage.find({"_id": {"$in": ids}, "claim": claim}).to_list()
+
+    def outcome(
+        self, message: OutboxMessage, error: Optional[str], now: datetime
+    ) -> Dict[str, Any]:
+        """
+        Returns the fields to set on a claimed message after trying to send
+        it, which failed with `error` unless it is None.
+        """
+        if error is None:
+            self.sent += 1
+            update: Dict[str, Any] = {"status": "sent", "sent_at": now}
+        elif message.attempts + 1 >= self.max_attempts:
+            self.failed += 1
+            logger.error("Giving up on e-mail %s: %s", message.id, error)
+            update = {"status": "failed"}
+        else:
+            self.retried += 1
+            delay = self.retry_delay(message.attempts + 1)
+            update = {"next_attempt_at": now + timedelta(seconds=delay)}
+        if "status" in update:
+            update.update(body="", expires_at=now + RETENTION)
+        if error is not None:
+            update.update(attempts=message.attempts + 1, last_error=error)
+        return {**update, "claim": None}
+
+    async def process(self) -> int:
+        """
+        Sends one batch of due messages.
+
+        :return: The number of messages claimed.
+        """
+        messages = await self.claim()
+        if not messages:
+            return 0
+
+        try:
+            errors = await self.transport.send([self.email(m) for m in messages])
+        except Exception as e:
+            logger.exception("Failed to send %d e-mails", len(messages))
+            errors = [repr(e)] * len(messages)
+
+        now = datetime.utcnow()
+        operations = [
+            UpdateOne({"_id": message.id}, {"$set": self.outcome(message, error, now)})
+            for message, error in zip(messages, errors)
+        ]
+        await OutboxMessage.get_motor_collection().bulk_write(operations, ordered=False)
+        return len(messages)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                processed = await self.process()
+            except Exception:
+                logger.exception("Failed to process the mail outbox")
+                processed = 0
+            if processed >= self.batch_size:
+                # more messages are probably due
+                continue
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    def start(self) -> None:
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._wake = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"sent": self.sent, "retried": self.retried, "failed": self.failed}
+
+
+outbox = Outbox(
+    transport=build_transport(),
+    sender=settings.MAIL_FROM,
+    base_url=settings.MAIL_LINK_BASE_URL,
+    batch_size=settings.MAIL_BATCH_SIZE,
+    poll_interval=settings.MAIL_POLL_INTERVAL_SECONDS,
+    max_attempts=settings.MAIL_MAX_ATTEMPTS,
+    retry_base=settings.MAIL_RETRY_BASE_SECONDS,
+)
@@ -1,14 +1,25 @@
 from beanie import PydanticObjectId
 from fastapi_users import BaseUserManager, InvalidPasswordException
 from fastapi import Request, Response
-from typing import Optional
+from fastapi.security import OAuth2PasswordRequestForm
+from typing import Any, Dict, Optional, Type, TypeVar
 from datetime import datetime
 from fastapi_users.db import ObjectIDIDMixin
-from .schemas import UserCreate, UserUpdate
-from .db import User
+from fastapi_users.jwt import decode_jwt, generate_jwt
+from pydantic import BaseModel
+from .schemas import UserCreate
+from .db import User, user_write_buffer
+from .hashing import password_hasher
+from .mail import outbox
+from .policy import is_strong, password_policy
+from .refresh import refresh_tokens
+from .strategy import mark_user_changed
 from app.config.settings import settings
-import re
-from fastapi_users import models
+import jwt
+from fastapi_users import exceptions, models
+
+
+P = TypeVar("P", bound=BaseModel)
 
 
 def check_password_strength(password: str):
@@ -17,36 +28,37 @@ def check_password_strength(password: str):
     lowercase, uppercase, number and special symbol.
     """
 
-    regex = r"^(?=.*[a-z])(?=.*[A-Z])(?=.*\d)(?=.*[@#$%^&+=!])[A-Za-z\d@#$%^&+=!]*$"
-    if not re.search(regex, password):
-        return False
-    return True
+    return is_strong(frozenset(password))
 
 
 class CustomUserManager(ObjectIDIDMixin, BaseUserManager[User, PydanticObjectId]):
+    """
+    `create`, `authenticate`, `forgot_password`, `reset_password` and
+    `_update` are copies of the fastapi-users 12.1.2 methods that await
+    the hashing pool instead of hashing on the event loop. fastapi-users
+    is pinned so that they cannot drift from the originals unnoticed.
+    """
+
     reset_password_token_secret = settings.SECRET_KEY
     verification_token_secret = settings.SECRET_KEY
+    password_hasher = password_hasher
+    password_policy = password_policy
 
-    async def validate_password(self, password: str, user: UserCreate | User) -> None:
-        if len(password) < 8:
-            raise InvalidPasswordException(
-                reason="Password should be at least 8 characters"
-            )
-        if user.email in password:
-            raise InvalidPasswordException(reason="Password should not contain e-mail")
+    async def get_projected(self, id: PydanticObjectId, model: Type[P]) -> P:
+        """
+        Gets a user by id, loading only the fields of `model`.
 
-        if user.first_name and user.first_name in password:
-            raise InvalidPasswordException(
-                reason="Password should not contain first_name"
-            )
-        if user.first_name and user.last_name in password:
-            raise InvalidPasswordException(
-                reason="Password should not contain last_name"
-            )
-        if not check_password_strength(password):
-            raise InvalidPasswordException(
-                reason="Password must contain a lowercase letter, uppercase letter, a number and a special symbol"
-            )
+        :raises UserNotExists: The user does not exist.
+        """
+        user = await self.user_db.get_projected(id, model)
+        if user is None:
+            raise exceptions.UserNotExists()
+        return user
+
+    async def validate_password(self, password: str, user: UserCreate | User) -> None:
+        violations = self.password_policy.validate(password, user)
+        if violations:
+            raise InvalidPasswordException(reason="; ".join(violations))
 
     async def on_after_login(
         self,
@@ -54,23 +66,194 @@ class CustomUserManager(ObjectIDIDMixin, BaseUserManager[User, PydanticObjectId]
         request: Optional[Request] = None,
         response: Optional[Response] = None,
     ) -> None:
-        await self.update(
-            user_update=UserUpdate(last_login=datetime.utcnow()), user=user, safe=True
-        )
+        user_write_buffer.add(user, last_login=datetime.utcnow())
+
+    async def on_after_update(
+        self,
+        user: User,
+        update_dict: Dict[str, Any],
+        request: Optional[Request] = None,
+    ) -> None:
+        # last_login alone does not invalidate the claims of issued tokens
+        if set(update_dict) - {"last_login"}:
+            await mark_user_changed(str(user.id))
+
+    async def on_after_verify(
+        self, user: User, request: Optional[Request] = None
+    ) -> None:
+        await mark_user_changed(str(user.id))
+
+    async def on_after_delete(
+        self, user: User, request: Optional[Request] = None
+    ) -> None:
+        await mark_user_changed(str(user.id))
 
     async def on_after_forgot_password(
         self, user: models.UP, token: str, request: Optional[Request] = None
-    ) -> str:
-        # send the user an email with link to reset their password
-        pass
+    ) -> None:
+        await outbox.enqueue(
+            user.email,
+            "forgot_password",
+            name=user.first_name or user.email,
+            token=token,
+        )
 
     async def on_after_reset_password(
         self, user: models.UP, request: Optional[Request] = None
     ) -> None:
-        # send the user an email notifying them of successfully changing their password
-        pass
+        await mark_user_changed(str(user.id))
+        await refresh_tokens.revoke_user(user.id)
+        await outbox.enqueue(
+            user.email, "reset_password", name=user.first_name or user.email
+        )
 
     async def on_after_request_verify(
         self, user: models.UP, token: str, request: Optional[Request] = None
     ) -> None:
-        pass
+        await outbox.enqueue(
+            user.email, "verify", name=user.first_name or user.email, token=token
+        )
+
+    async def create(
+        self,
+        user_create: UserCreate,
+        safe: bool = False,
+        request: Optional[Request] = None,
+    ) -> User:
+        await self.validate_password(user_create.password, user_create)
+
+        existing_user = await self.user_db.get_by_email(user_create.email)
+        if existing_user is not None:
+            raise exceptions.UserAlreadyExists()
+
+        user_dict = (
+            user_create.create_update_dict()
+            if safe
+            else user_create.create_update_dict_superuser()
+        )
+        password = user_dict.pop("password")
+        user_dict["hashed_password"] = await self.password_hasher.hash(password)
+
+        created_user = await self.user_db.create(user_dict)
+
+        await self.on_after_register(created_user, request)
+
+        return created_user
+
+    async def authenticate(
+        self, credentials: OAuth2PasswordRequestForm
+    ) -> Optional[User]:
+        # no password this long was ever accepted, and passlib refuses to
+        # hash one, so reject it before anything can tell users apart
+        if len(credentials.password) > self.password_policy.max_length:
+            return None
+
+        user = await self.user_db.get_full_by_email(credentials.username)
+        if user is None:
+            # Take as long as a real verification to mitigate timing attacks
+            delay = None
+            if settings.LOGIN_UNKNOWN_USER_MODE == "delay":
+                delay = self.password_hasher.metrics.sample_latency()
+            if delay is None:
+                await self.password_hasher.hash(credentials.password)
+            else:
+                # queued like a verification, so it is rejected like one
+                await self.password_hasher.hold(delay)
+            return None
+
+        verified, updated_password_hash = await self.password_hasher.verify_and_update(
+            credentials.password, user.hashed_password
+        )
+        if not verified:
+            return None
+        if updated_password_hash is not None:
+            # Upgrading the hash is not urgent, so keep it off the response
+            # path. It only applies if the password was not changed since.
+            user_write_buffer.compare_and_set(
+                user, "hashed_password", user.hashed_password, updated_password_hash
+            )
+
+        return user
+
+    async def forgot_password(
+        self, user: User, request: Optional[Request] = None
+    ) -> None:
+        if not user.is_active:
+            raise exceptions.UserInactive()
+
+        # the password hash is not cached
+        user = await self.user_db.get_full(user.id)
+        if user is None:
+            raise exceptions.UserNotExists()
+        token_data = {
+            "sub": str(user.id),
+            "password_fgpt": await self.password_hasher.hash(user.hashed_password),
+            "aud": self.reset_password_token_audience,
+        }
+        token = generate_jwt(
+            token_data,
+            self.reset_password_token_secret,
+            self.reset_password_token_lifetime_seconds,
+        )
+        await self.on_after_forgot_password(user, token, request)
+
+    async def reset_password(
+        self, token: str, password: str, request: Optional[Request] = None
+    ) -> User:
+        try:
+            data = decode_jwt(
+                token,
+                self.reset_password_token_secret,
+                [self.reset_password_token_audience],
+            )
+        except jwt.PyJWTError:
+            raise exceptions.InvalidResetPasswordToken()
+
+        try:
+            user_id = data["sub"]
+            password_fingerprint = data["password_fgpt"]
+        except KeyError:
+            raise exceptions.InvalidResetPasswordToken()
+
+        try:
+            parsed_id = self.parse_id(user_id)
+        except exceptions.InvalidID:
+            raise exceptions.InvalidResetPasswordToken()
+
+        user = await self.user_db.get_full(parsed_id)
+        if user is None:
+            raise exceptions.UserNotExists()
+
+        valid_password_fingerprint, _ = await self.password_hasher.verify_and_update(
+            user.hashed_password, password_fingerprint
+        )
+        if not valid_password_fingerprint:
+            raise exceptions.InvalidResetPasswordToken()
+
+        if not user.is_active:
+            raise exceptions.UserInactive()
+
+        updated_user = await self._update(user, {"password": password})
+
+        await self.on_after_reset_password(user, request)
+
+        return updated_user
+
+    async def _update(self, user: User, update_dict: Dict[str, Any]) -> User:
+        validated_update_dict = {}
+        for field, value in update_dict.items():
+            if field == "email" and value != user.email:
+                try:
+                    await self.get_by_email(value)
+                    raise exceptions.UserAlreadyExists()
+                except exceptions.UserNotExists:
+                    validated_update_dict["email"] = value
+                    validated_update_dict["is_verified"] = False
+            elif field == "password" and value is not None:
+                await self.validate_password(value, user)
+                validated_update_dict[
+                    "hashed_password"
+                ] = await self.password_hasher.hash(value)
+            else:
+                validated_update_dict[field] = value
+        return await self.user_db.update(user, validated_update_dict)
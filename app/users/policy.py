@@ -0,0 +1,154 @@
+from abc import ABC, abstractmethod
+from typing import Any, List, Optional, Sequence
+from app.config.settings import settings
+from .breached import BreachedPasswordIndex, load_breached_index
+import string
+
+
+LOWERCASE = frozenset(string.ascii_lowercase)
+UPPERCASE = frozenset(string.ascii_uppercase)
+DIGITS = frozenset(string.digits)
+SYMBOLS = frozenset("@#$%^&+=!")
+ALLOWED_CHARACTERS = LOWERCASE | UPPERCASE | DIGITS | SYMBOLS
+
+STRENGTH_MESSAGE = (
+    "Password must contain a lowercase letter, uppercase letter, "
+    "a number and a special symbol"
+)
+
+# User fields a password may not contain, with the message reported for each
+FORBIDDEN_FIELDS = {
+    "email": "Password should not contain e-mail",
+    "first_name": "Password should not contain first_name",
+    "last_name": "Password should not contain last_name",
+}
+
+
+def is_strong(characters: frozenset) -> bool:
+    """
+    Checks that the distinct characters of a password cover every
+    character class and nothing outside the allowed set.
+    """
+    return (
+        characters <= ALLOWED_CHARACTERS
+        and not characters.isdisjoint(LOWERCASE)
+        and not characters.isdisjoint(UPPERCASE)
+        and not characters.isdisjoint(DIGITS)
+        and not characters.isdisjoint(SYMBOLS)
+    )
+
+
+class PasswordRule(ABC):
+    """
+    Extra check run by a `PasswordPolicy` after its built-in ones.
+    """
+
+    @abstractmethod
+    def check(self, password: str, user: Any) -> Optional[str]:
+        """
+        Returns the violation message, or None when the password passes.
+        """
+
+
+class ZxcvbnRule(PasswordRule):
+    """
+    Rejects passwords whose zxcvbn strength score is below `min_score`.
+    Requires the optional `zxcvbn` package.
+    """
+
+    def __init__(self, min_score: int) -> None:
+        from zxcvbn import zxcvbn
+
+        self.zxcvbn = zxcvbn
+        self.min_score = min_score
+
+    def check(self, password: str, user: Any) -> Optional[str]:
+        user_inputs = [
+            value
+            for value in (getattr(user, field, None) for field in FORBIDDEN_FIELDS)
+            if value
+        ]
+        result = self.zxcvbn(password, user_inputs=user_inputs)
+        if result["score"] < self.min_score:
+            return "Password is too easy to guess"
+        return None
+
+
+class BreachedPasswordRule(PasswordRule):
+    """
+    Rejects passwords found in a local breached password index.
+    """
+
+    def __init__(self, index: BreachedPasswordIndex) -> None:
+        self.index = index
+
+    def check(self, password: str, user: Any) -> Optional[str]:
+        if password in self.index:
+            return "Password has appeared in a data breach"
+        return None
+
+
+class PasswordPolicy:
+    """
+    Validates a password and returns every violation at once. Character
+    classes are checked on the set of distinct characters, built in one
+    pass. Passwords longer than `max_length` are rejected before any other
+    check, which bounds the cost of validating and then hashing them.
+
+    :param min_length: Minimum number of characters.
+    :param max_length: Maximum number of characters.
+    :param rules: Extra rules checked after the built-in ones.
+    """
+
+    def __init__(
+        self, min_length: int, max_length: int, rules: Sequence[PasswordRule] = ()
+    ) -> None:
+        self.min_length = min_length
+        self.max_length = max_length
+        self.rules = list(rules)
+
+    def forbidden_substrings(self, password: str, user: Any) -> List[str]:
+        # CPython's substring search beats a regex alternation for a handful
+        # of needles, so lowercase once and search for each of them.
+        lowered = password.lower()
+        return [
+            field
+            for field in FORBIDDEN_FIELDS
+            if (value := getattr(user, field, None)) and value.lower() in lowered
+        ]
+
+    def validate(self, password: str, user: Any) -> List[str]:
+        if len(password) > self.max_length:
+            return [f"Password should be at most {self.max_length} characters"]
+
+        violations = []
+        if len(password) < self.min_length:
+            violations.append(
+                f"Password should be at least {self.min_length} characters"
+            )
+        for field in self.forbidden_substrings(password, user):
+            violations.append(FORBIDDEN_FIELDS[field])
+        if not is_strong(frozenset(password)):
+            violations.append(STRENGTH_MESSAGE)
+        for rule in self.rules:
+            violation = rule.check(password, user)
+            if violation is not None:
+                violations.append(violation)
+        return violations
+
+
+def build_password_policy() -> PasswordPolicy:
+    rules: List[PasswordRule] = []
+    breached_index = load_breached_index(settings.BREACHED_PASSWORDS_INDEX)
+    if breached_index is not None:
+        rules.append(BreachedPasswordRule(breached_index))
+    if settings.PASSWORD_MIN_ZXCVBN_SCORE is not None:
+        rules.append(ZxcvbnRule(settings.PASSWORD_MIN_ZXCVBN_SCORE))
+    return PasswordPolicy(
+        min_length=settings.PASSWORD_MIN_LENGTH,
+        max_length=settings.PASSWORD_MAX_LENGTH,
+        rules=rules,
+    )
+
+
+password_policy = build_password_policy()
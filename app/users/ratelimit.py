@@ -0,0 +1,229 @@
+from fastapi import HTTPException, Request, status
+from ipaddress import IPv4Network, IPv6Network, ip_address, ip_network
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+from app.config.settings import settings
+from .db import normalize_email
+from .store import MemoryStore, SharedStore, get_store
+import logging
+import math
+import time
+
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimit:
+    """
+    At most `limit` requests per `window` seconds, counted with a sliding
+    window: the count of the previous fixed window is weighted by how much
+    of it still overlaps the sliding one.
+    """
+
+    def __init__(self, scope: str, limit: int, window: float) -> None:
+        self.scope = scope
+        self.limit = limit
+        self.window = window
+
+    def retry_after(self, previous: int, current: int, now: float) -> Optional[float]:
+        """
+        Returns None when the request is allowed, otherwise how many seconds
+        until another request would be.
+        """
+        offset = now % self.window
+        if previous * (1 - offset / self.window) + current <= self.limit:
+            return None
+
+        if current < self.limit:
+            # room frees up in this window as the previous one fades out
+            fraction = 1 - (self.limit - current - 1) / previous
+            return fraction * self.window - offset
+        fraction = max(0, 1 - (self.limit - 1) / current)
+        return self.window - offset + fraction * self.window
+
+
+class RateLimiter:
+    """
+    Counts requests against rate limits in a shared store. Without a store
+    of its own, the process-wide shared store is used.
+    """
+
+    def __init__(self, store: Optional[SharedStore] = None) -> None:
+        self._store = store
+        self.checked = 0
+        self.rejected = 0
+
+    @property
+    def store(self) -> SharedStore:
+        return self._store if self._store is not None else get_store()
+
+    async def hit(self, checks: Sequence[Tuple[RateLimit, str]]) -> Optional[float]:
+        """
+        Counts one request against each limit for its identity.
+
+        :return: None when every limit allows the request, otherwise the
+        number of seconds to wait before retrying.
+        """
+        now = time.time()
+        current_keys, previous_keys = [], []
+        for limit, identity in checks:
+            index = int(now // limit.window)
+            current_keys.append(f"rate:{limit.scope}:{identity}:{index}")
+            previous_keys.append(f"rate:{limit.scope}:{identity}:{index - 1}")
+
+        ttl = 2 * max(limit.window for limit, _ in checks)
+        counts, previous_counts = await self.store.incr_and_get_many(
+            current_keys, previous_keys, ttl=ttl
+        )
+
+        self.checked += 1
+        retry_after = None
+        for (limit, _), count, previous in zip(checks, counts, previous_counts):
+            wait = limit.retry_after(int(previous or 0), count, now)
+            if wait is not None:
+                retry_after = max(retry_after or 0, wait)
+        if retry_after is not None:
+            self.rejected += 1
+        return retry_after
+
+    def stats(self) -> Dict[str, Any]:
+        return {"checked": self.checked, "rejected": self.rejected}
+
+
+def build_route_limits() -> Dict[str, List[Tuple[RateLimit, Optional[str]]]]:
+    """
+    Limits by route name, each keyed either by client IP (None) or by the
+    request field holding the account e-mail. A limit of 0 disables it.
+    """
+    window = settings.RATE_LIMIT_WINDOW_SECONDS
+    auth_per_ip = RateLimit("auth:ip", settings.RATE_LIMIT_AUTH_PER_IP, window)
+    # both send an e-mail to the account
+    email_per_account = RateLimit(
+        "email:account", settings.RATE_LIMIT_EMAIL_PER_ACCOUNT, window
+    )
+    limits = {
+        "auth:jwt.login": [
+            (RateLimit("login:ip", settings.RATE_LIMIT_LOGIN_PER_IP, window), None),
+            (
+                RateLimit(
+                    "login:account", settings.RATE_LIMIT_LOGIN_PER_ACCOUNT, window
+                ),
+                "username",
+            ),
+        ],
+        "auth:jwt.refresh": [(auth_per_ip, None)],
+        "register:register": [
+            (
+                RateLimit("register:ip", settings.RATE_LIMIT_REGISTER_PER_IP, window),
+                None,
+            )
+        ],
+        "reset:forgot_password": [
+            (auth_per_ip, None),
+            (email_per_account, "email"),
+        ],
+        "reset:reset_password": [(auth_per_ip, None)],
+        "verify:request-token": [
+            (auth_per_ip, None),
+            (email_per_account, "email"),
+        ],
+        "verify:verify": [(auth_per_ip, None)],
+    }
+    return {
+        name: [(limit, field) for limit, field in checks if limit.limit > 0]
+        for name, checks in limits.items()
+    }
+
+
+Network = Union[IPv4Network, IPv6Network]
+
+
+def parse_networks(value: Optional[str]) -> List[Network]:
+    """
+    Parses comma separated IP addresses and CIDR ranges.
+    """
+    if not value:
+        return []
+    return [ip_network(item.strip()) for item in value.split(",") if item.strip()]
+
+
+def _is_trusted(address: str, trusted: Sequence[Network]) -> bool:
+    try:
+        ip = ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in trusted)
+
+
+def client_ip(request: Request, trusted: Sequence[Network]) -> str:
+    """
+    Returns the address of the client. Behind trusted proxies, that is the
+    last address of `X-Forwarded-For` not added by one of them: anything
+    before it may have been sent by the client itself.
+    """
+    peer = request.client.host if request.client else "unknown"
+    if not _is_trusted(peer, trusted):
+        return peer
+
+    forwarded = request.headers.get("x-forwarded-for", "")
+    hops = [hop.strip() for hop in forwarded.split(",") if hop.strip()]
+    for hop in reversed(hops):
+        if not _is_trusted(hop, trusted):
+            return hop
+    return hops[0] if hops else peer
+
+
+async def _request_field(request: Request, field: str) -> Optional[str]:
+    # FastAPI has already parsed the body, so this reads the cached result
+    try:
+        if request.headers.get("content-type", "").startswith("application/json"):
+            value = (await request.json()).get(field)
+        else:
+            value = (await request.form()).get(field)
+    except Exception:
+        return None
+    return value if isinstance(value, str) else None
+
+
+route_limits = build_route_limits()
+trusted_proxies = parse_networks(settings.RATE_LIMIT_TRUSTED_PROXIES)
+rate_limiter = RateLimiter(
+    None
+    if settings.SHARED_STORE_URL
+    else MemoryStore(maxsize=settings.RATE_LIMIT_MAX_KEYS)
+)
+
+
+async def rate_limit(request: Request) -> None:
+    """
+    Rejects requests over the limits of their route with a 429, before the
+    route does any database or hashing work.
+    """
+    route = request.scope.get("route")
+    limits = route_limits.get(getattr(route, "name", None))
+    if not settings.RATE_LIMIT_ENABLED or not limits:
+        return
+
+    ip = client_ip(request, trusted_proxies)
+    checks = []
+    for limit, field in limits:
+        if field is None:
+            checks.append((limit, ip))
+            continue
+        email = await _request_field(request, field)
+        if email:
+            checks.append((limit, normalize_email(email)))
+    if not checks:
+        return
+
+    try:
+        retry_after = await rate_limiter.hit(checks)
+    except Exception:
+        # an unavailable store must not lock everybody out
+        logger.exception("Failed to check rate limits")
+        return
+    if retry_after is not None:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="TOO_MANY_REQUESTS",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
@@ -0,0 +1,116 @@
+from beanie import Document, PydanticObjectId
+from datetime import datetime, timedelta
+from pydantic.fields import Field
+from pymongo import ASCENDING, IndexModel, ReturnDocument
+from typing import List, Optional, Tuple
+from app.config.settings import settings
+import hashlib
+import hmac
+import secrets
+import uuid
+
+
+class InvalidRefreshToken(Exception):
+    pass
+
+
+class RefreshToken(Document):
+    token_hash: str
+    family_id: str
+    user_id: PydanticObjectId
+    expires_at: datetime
+    used: bool = False
+    revoked: bool = False
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+    class Settings:
+        indexes = [
+            IndexModel("token_hash", unique=True),
+            IndexModel("family_id"),
+            IndexModel("user_id"),
+            IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+        ]
+
+
+def hash_refresh_token(token: str) -> str:
+    # refresh tokens are random, so a keyed hash is enough to store them safely
+    return hmac.new(
+        settings.SECRET_KEY.encode(), token.encode(), hashlib.sha256
+    ).hexdigest()
+
+
+class RefreshTokenStore:
+    """
+    Opaque, rotating refresh tokens. Each token can be exchanged once;
+    presenting an already used token revokes its whole family.
+    """
+
+    def __init__(self, lifetime: timedelta) -> None:
+        self.lifetime = lifetime
+
+    async def issue(
+        self, user_id: PydanticObjectId, family_id: Optional[str] = None
+    ) -> Tuple[str, str]:
+        """
+        Returns a new refresh token and its family id.
+        """
+        token = secrets.token_urlsafe(32)
+        family_id = family_id or uuid.uuid4().hex
+        await RefreshToken(
+            token_hash=hash_refresh_token(token),
+            family_id=family_id,
+            user_id=user_id,
+            expires_at=datetime.utcnow() + self.lifetime,
+        ).insert()
+        return token, family_id
+
+    async def rotate(self, token: str) -> Tuple[PydanticObjectId, str, str]:
+        """
+        Exchanges a refresh token for a new one in the same family.
+
+        :raises InvalidRefreshToken: The token is unknown, expired, revoked
+        or was already used.
+        :return: The user id, the family id and the new refresh token.
+        """
+        token_hash = hash_refresh_token(token)
+        collection = RefreshToken.get_motor_collection()
+        document = await collection.find_one_and_update(
+            {
+                "token_hash": token_hash,
+                "used": False,
+                "revoked": False,
+                "expires_at": {"$gt": datetime.utcnow()},
+            },
+            {"$set": {"used": True}},
+            return_document=ReturnDocument.AFTER,
+        )
+        if document is None:
+            reused = await collection.find_one(
+                {"token_hash": token_hash, "used": True}, {"family_id": 1}
+            )
+            if reused is not None:
+                await self.revoke_family(reused["family_id"])
+            raise InvalidRefreshToken()
+
+        new_token, family_id = await self.issue(
+            document["user_id"], document["family_id"]
+        )
+        return document["user_id"], family_id, new_token
+
+    async def revoke_family(self, family_id: str) -> None:
+        await RefreshToken.get_motor_collection().update_many(
+            {"family_id": family_id}, {"$set": {"revoked": True}}
+        )
+
+    async def revoke_user(self, user_id: PydanticObjectId) -> None:
+        await self.revoke_users([user_id])
+
+    async def revoke_users(self, user_ids: List[PydanticObjectId]) -> None:
+        await RefreshToken.get_motor_collection().update_many(
+            {"user_id": {"$in": user_ids}}, {"$set": {"revoked": True}}
+        )
+
+
+refresh_tokens = RefreshTokenStore(
+    lifetime=timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+)
@@ -0,0 +1,173 @@
+from beanie import Document, PydanticObjectId
+from datetime import datetime, timedelta
+from hashlib import blake2b
+from pydantic.fields import Field
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import DuplicateKeyError
+from typing import Any, Dict, Optional
+from app.config.settings import settings
+import asyncio
+import logging
+import math
+
+
+logger = logging.getLogger(__name__)
+
+# Revocations are stamped with the clock of the worker that made them, so
+# each refresh looks back this far to tolerate skew between workers.
+CLOCK_SKEW = timedelta(seconds=60)
+
+
+class RevokedToken(Document):
+    jti: str
+    user_id: PydanticObjectId
+    expires_at: datetime
+    revoked_at: datetime = Field(default_factory=datetime.utcnow)
+
+    class Settings:
+        indexes = [
+            IndexModel("jti", unique=True),
+            IndexModel("revoked_at"),
+            # MongoDB drops each record once the token would have expired anyway
+            IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+        ]
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter sized for `capacity` items at `fp_rate`.
+    """
+
+    def __init__(self, capacity: int, fp_rate: float) -> None:
+        self.capacity = capacity
+        self.fp_rate = fp_rate
+        self.size = max(8, math.ceil(-capacity * math.log(fp_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        digest = blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(item)
+        )
+
+    def estimated_fp_rate(self) -> float:
+        return (1 - math.exp(-self.hash_count * self.count / self.size)) ** (
+            self.hash_count
+        )
+
+
+class TokenRevocationList:
+    """
+    Revoked token ids, stored in a MongoDB TTL collection and mirrored in an
+    in-memory Bloom filter so that checking a token that was never revoked
+    needs no I/O. The filter picks up revocations made by other workers every
+    `refresh_interval` seconds and is rebuilt once it holds more than
+    `capacity` ids.
+    """
+
+    def __init__(self, capacity: int, fp_rate: float, refresh_interval: float) -> None:
+        self.capacity = capacity
+        self.fp_rate = fp_rate
+        self.refresh_interval = refresh_interval
+        self.bloom = BloomFilter(capacity, fp_rate)
+        self.last_revoked_at = datetime.min
+        self.checks = 0
+        self.bloom_positives = 0
+        self.false_positives = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def revoke(
+        self, jti: str, user_id: PydanticObjectId, expires_at: datetime
+    ) -> None:
+        try:
+            await RevokedToken(jti=jti, user_id=user_id, expires_at=expires_at).insert()
+        except DuplicateKeyError:
+            pass
+        self.bloom.add(jti)
+
+    async def is_revoked(self, jti: str) -> bool:
+        self.checks += 1
+        if jti not in self.bloom:
+            return False
+
+        self.bloom_positives += 1
+        if await RevokedToken.find_one(RevokedToken.jti == jti) is None:
+            self.false_positives += 1
+            return False
+        return True
+
+    async def rebuild(self) -> None:
+        bloom = BloomFilter(self.capacity, self.fp_rate)
+        last_revoked_at = datetime.min
+        async for token in RevokedToken.find(
+            RevokedToken.expires_at > datetime.utcnow()
+        ):
+            bloom.add(token.jti)
+            last_revoked_at = max(last_revoked_at, token.revoked_at)
+        self.bloom = bloom
+        self.last_revoked_at = last_revoked_at
+
+    async def refresh(self) -> None:
+        if self.bloom.count > self.capacity:
+            await self.rebuild()
+            return
+
+        since = max(self.last_revoked_at, datetime.min + CLOCK_SKEW) - CLOCK_SKEW
+        async for token in RevokedToken.find(RevokedToken.revoked_at >= since):
+            if token.jti not in self.bloom:
+                self.bloom.add(token.jti)
+            self.last_revoked_at = max(self.last_revoked_at, token.revoked_at)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("Failed to refresh the token revocation list")
+
+    async def start(self) -> None:
+        await self.rebuild()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "capacity": self.capacity,
+            "fp_rate": self.fp_rate,
+            "size_bytes": len(self.bloom.bits),
+            "hash_count": self.bloom.hash_count,
+            "items": self.bloom.count,
+            "estimated_fp_rate": self.bloom.estimated_fp_rate(),
+            "checks": self.checks,
+            "bloom_positives": self.bloom_positives,
+            "false_positives": self.false_positives,
+        }
+
+
+revocation_list = TokenRevocationList(
+    capacity=settings.REVOCATION_BLOOM_CAPACITY,
+    fp_rate=settings.REVOCATION_BLOOM_FP_RATE,
+    refresh_interval=settings.REVOCATION_REFRESH_SECONDS,
+)
@@ -1,10 +1,51 @@
-from fastapi import APIRouter
-from .schemas import UserCreate, UserRead, UserUpdate
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from fastapi_users import exceptions
+from .bulk import (
+    EXPORT_FORMATS,
+    apply_bulk_action,
+    export_users,
+    import_users,
+    iter_lines,
+)
+from .db import user_cache_stats
+from .hashing import password_hasher
+from .listing import InvalidListQuery, build_filter, parse_fields, stream_users
+from .mail import outbox
+from .manager import CustomUserManager
+from .ratelimit import rate_limit, rate_limiter
+from .refresh import InvalidRefreshToken, refresh_tokens
+from .revocation import revocation_list
+from .schemas import (
+    BulkActionRequest,
+    BulkActionResponse,
+    BulkImportResponse,
+    UserAuth,
+    IntrospectionBatchResponse,
+    IntrospectionRequest,
+    IntrospectionResponse,
+    RefreshTokenRequest,
+    TokenPairResponse,
+    UserCreate,
+    UserRead,
+    UserUpdate,
+)
+from .strategy import ClaimsJWTStrategy
+from .store import get_store
 from .utils import (
     auth_backend,
+    bearer_transport,
+    current_superuser,
+    current_user_read,
     fastapi_users,
+    get_jwt_strategy,
+    get_user_manager,
+    jwks,
+    jwt_strategy,
 )
 from app.config.settings import Settings
+from typing import Literal, Optional, Union
 
 
 settings = Settings()
@@ -15,13 +56,74 @@ router.include_router(
     fastapi_users.get_auth_router(auth_backend),
     prefix="/auth/jwt",
     tags=["auth"],
+    dependencies=[Depends(rate_limit)],
+)
+
+
+@router.post(
+    "/auth/jwt/refresh",
+    response_model=TokenPairResponse,
+    name="auth:jwt.refresh",
+    tags=["auth"],
+    dependencies=[Depends(rate_limit)],
+)
+async def refresh(
+    body: RefreshTokenRequest,
+    user_manager: CustomUserManager = Depends(get_user_manager),
+    strategy: ClaimsJWTStrategy = Depends(get_jwt_strategy),
+):
+    try:
+        user_id, family_id, refresh_token = await refresh_tokens.rotate(
+            body.refresh_token
+        )
+        user = await user_manager.get(user_id)
+    except (InvalidRefreshToken, exceptions.UserNotExists):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="REFRESH_BAD_TOKEN"
+        )
+    if not user.is_active:
+        await refresh_tokens.revoke_family(family_id)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="REFRESH_BAD_TOKEN"
+        )
+
+    access_token = await strategy.write_token(user, family_id=family_id)
+    return await bearer_transport.get_token_pair_response(access_token, refresh_token)
+
+
+@router.post(
+    "/auth/introspect",
+    response_model=Union[IntrospectionResponse, IntrospectionBatchResponse],
+    response_model_exclude_none=True,
+    name="auth:introspect",
+    tags=["auth"],
+    dependencies=[Depends(current_superuser)],
 )
+async def introspect(
+    body: IntrospectionRequest,
+    strategy: ClaimsJWTStrategy = Depends(get_jwt_strategy),
+):
+    if body.tokens is None:
+        return (await strategy.introspect([body.token]))[0]
+    return {"results": await strategy.introspect(body.tokens)}
+
+
+@router.get("/.well-known/jwks.json", tags=["auth"], name="auth:jwks")
+async def jwks_document(request: Request):
+    headers = {
+        "Cache-Control": f"public, max-age={settings.JWKS_MAX_AGE_SECONDS}",
+        "ETag": jwks.etag,
+    }
+    if request.headers.get("if-none-match") == jwks.etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=jwks.body, media_type="application/json", headers=headers)
 
 
 router.include_router(
     fastapi_users.get_register_router(UserRead, UserCreate),
     prefix="/auth",
     tags=["auth"],
+    dependencies=[Depends(rate_limit)],
 )
 
 
@@ -29,6 +131,7 @@ router.include_router(
     fastapi_users.get_reset_password_router(),
     prefix="/auth",
     tags=["auth"],
+    dependencies=[Depends(rate_limit)],
 )
 
 
@@ -36,11 +139,146 @@ router.include_router(
     fastapi_users.get_verify_router(UserRead),
     prefix="/auth",
     tags=["auth"],
+    dependencies=[Depends(rate_limit)],
 )
 
 
+# Registered ahead of the fastapi-users router so that it takes precedence
+# over its `GET /users/me` and can be served from token claims.
+@router.get(
+    "/users/me",
+    response_model=UserRead,
+    name="users:current_user_claims",
+    tags=["users"],
+)
+async def me(user: UserRead = Depends(current_user_read)):
+    return user
+
+
+@router.get(
+    "/users",
+    name="users:list",
+    tags=["users"],
+    dependencies=[Depends(current_superuser)],
+)
+async def list_users(
+    cursor: Optional[str] = None,
+    limit: int = Query(
+        settings.USER_LIST_DEFAULT_LIMIT, ge=1, le=settings.USER_LIST_MAX_LIMIT
+    ),
+    fields: Optional[str] = Query(None, description="Comma separated fields"),
+    is_active: Optional[bool] = None,
+    is_verified: Optional[bool] = None,
+    # not index-bounded, so selective values read more users per page
+    email_prefix: Optional[str] = None,
+    last_login_after: Optional[datetime] = None,
+    last_login_before: Optional[datetime] = None,
+):
+    try:
+        selected = parse_fields(fields)
+        query = build_filter(
+            is_active=is_active,
+            is_verified=is_verified,
+            email_prefix=email_prefix,
+            last_login_after=last_login_after,
+            last_login_before=last_login_before,
+            cursor=cursor,
+        )
+    except InvalidListQuery as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return StreamingResponse(
+        stream_users(query, selected, limit), media_type="application/json"
+    )
+
+
+@router.post(
+    "/users/import",
+    response_model=BulkImportResponse,
+    name="users:import",
+    tags=["users"],
+    dependencies=[Depends(current_superuser)],
+)
+async def import_users_ndjson(
+    request: Request,
+    batch_size: int = Query(settings.BULK_IMPORT_BATCH_SIZE, ge=1),
+):
+    """
+    Creates users from an NDJSON body of `UserCreate` objects, read as it
+    is received, and reports the lines that failed.
+    """
+    return await import_users(iter_lines(request.stream()), batch_size)
+
+
+@router.post(
+    "/users/bulk",
+    response_model=BulkActionResponse,
+    name="users:bulk",
+    tags=["users"],
+)
+async def bulk_action(
+    body: BulkActionRequest, user: UserAuth = Depends(current_superuser)
+):
+    """
+    Deactivates, activates, verifies, unverifies or deletes the given users,
+    or the users matching a filter. The acting superuser is never affected.
+    """
+    if body.ids is not None:
+        query = {"_id": {"$in": body.ids}}
+    else:
+        query = build_filter(**body.filter.model_dump())
+    return await apply_bulk_action(body.action, query, exclude_id=user.id)
+
+
+# Registered ahead of the fastapi-users router, whose `GET /users/{id}`
+# would match it otherwise.
+@router.get(
+    "/users/export",
+    name="users:export",
+    tags=["users"],
+    dependencies=[Depends(current_superuser)],
+)
+async def export_users_stream(
+    format: Literal[EXPORT_FORMATS] = "ndjson",
+    fields: Optional[str] = Query(None, description="Comma separated fields"),
+    is_active: Optional[bool] = None,
+    is_verified: Optional[bool] = None,
+    email_prefix: Optional[str] = None,
+    last_login_after: Optional[datetime] = None,
+    last_login_before: Optional[datetime] = None,
+):
+    try:
+        selected = parse_fields(fields)
+    except InvalidListQuery as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    query = build_filter(
+        is_active=is_active,
+        is_verified=is_verified,
+        email_prefix=email_prefix,
+        last_login_after=last_login_after,
+        last_login_before=last_login_before,
+    )
+    return StreamingResponse(
+        export_users(query, selected, format),
+        media_type="text/csv" if format == "csv" else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="users.{format}"'},
+    )
+
+
 router.include_router(
     fastapi_users.get_users_router(UserRead, UserUpdate, requires_verification=True),
     prefix="/users",
     tags=["users"],
 )
+
+
+@router.get("/metrics", tags=["metrics"], dependencies=[Depends(current_superuser)])
+async def metrics():
+    return {
+        "hashing": password_hasher.metrics.snapshot(),
+        "user_cache": dict(user_cache_stats),
+        "shared_store": get_store().stats(),
+        "revocation": revocation_list.stats(),
+        "token_cache": jwt_strategy.decode_cache.stats(),
+        "rate_limit": rate_limiter.stats(),
+        "mail": outbox.stats(),
+    }
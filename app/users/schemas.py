@@ -1,9 +1,10 @@
 from beanie import PydanticObjectId
 from fastapi_users import schemas
 from pydantic.fields import Field
-from pydantic import ConfigDict
-from typing import Optional
+from pydantic import BaseModel, ConfigDict, model_validator
+from typing import List, Literal, Optional
 from datetime import datetime
+from app.config.settings import settings
 
 
 class UserRead(schemas.BaseUser[PydanticObjectId]):
@@ -13,6 +14,18 @@ class UserRead(schemas.BaseUser[PydanticObjectId]):
     last_login: datetime | None
 
 
+class UserAuth(BaseModel):
+    """
+    The fields of a user needed to authorize a request.
+    """
+
+    id: PydanticObjectId
+    email: str
+    is_active: bool
+    is_superuser: bool
+    is_verified: bool
+
+
 class UserCreate(schemas.BaseUserCreate):
     model_config = ConfigDict(
         json_schema_extra={
@@ -43,3 +56,91 @@ class UserUpdate(schemas.CreateUpdateDictModel):
     first_name: Optional[str] = Field(min_length=3, default=None)
     last_name: Optional[str] = Field(min_length=3, default=None)
     password: Optional[str] = None
+
+
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
+
+
+class TokenPairResponse(BaseModel):
+    access_token: str
+    refresh_token: str
+    token_type: str
+
+
+class IntrospectionRequest(BaseModel):
+    token: Optional[str] = None
+    tokens: Optional[List[str]] = Field(
+        default=None, min_length=1, max_length=settings.INTROSPECTION_MAX_BATCH
+    )
+
+    @model_validator(mode="after")
+    def check_one_of(self) -> "IntrospectionRequest":
+        if (self.token is None) == (self.tokens is None):
+            raise ValueError("Provide either token or tokens")
+        return self
+
+
+class IntrospectionResponse(BaseModel):
+    active: bool
+    token_type: Optional[str] = None
+    sub: Optional[str] = None
+    username: Optional[str] = None
+    aud: Optional[List[str]] = None
+    exp: Optional[int] = None
+    iat: Optional[int] = None
+    jti: Optional[str] = None
+    is_verified: Optional[bool] = None
+    is_superuser: Optional[bool] = None
+
+
+class IntrospectionBatchResponse(BaseModel):
+    results: List[IntrospectionResponse]
+
+
+class BulkImportError(BaseModel):
+    line: int
+    error: str
+
+
+class BulkImportResponse(BaseModel):
+    inserted: int
+    failed: int
+    errors: List[BulkImportError]
+
+
+BulkAction = Literal["deactivate", "activate", "verify", "unverify", "delete"]
+
+
+class BulkUserFilter(BaseModel):
+    is_active: Optional[bool] = None
+    is_verified: Optional[bool] = None
+    email_prefix: Optional[str] = None
+    last_login_after: Optional[datetime] = None
+    last_login_before: Optional[datetime] = None
+
+    @model_validator(mode="after")
+    def check_not_empty(self) -> "BulkUserFilter":
+        # an empty filter would select every user
+        if all(value is None for value in self.model_dump().values()):
+            raise ValueError("Provide at least one filter")
+        return self
+
+
+class BulkActionRequest(BaseModel):
+    action: BulkAction
+    ids: Optional[List[PydanticObjectId]] = Field(
+        default=None, min_length=1, max_length=settings.BULK_ACTION_MAX_IDS
+    )
+    filter: Optional[BulkUserFilter] = None
+
+    @model_validator(mode="after")
+    def check_one_of(self) -> "BulkActionRequest":
+        if (self.ids is None) == (self.filter is None):
+            raise ValueError("Provide either ids or filter")
+        return self
+
+
+class BulkActionResponse(BaseModel):
+    matched: int
+    modified: int
@@ -0,0 +1,230 @@
+from abc import ABC, abstractmethod
+from math import ceil
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app.config.settings import settings
+from .cache import LRUCache
+
+
+class SharedStore(ABC):
+    """
+    Key/value state shared by every worker serving the app: cached users,
+    user revisions, revoked tokens and rate counters.
+
+    Batch methods are the primitives so that a request needing several keys
+    pays a single round trip to the store.
+
+    TTLs are in seconds. Without one an entry is kept until deleted, and an
+    entry set with a TTL of zero or less has already expired.
+    """
+
+    @abstractmethod
+    async def get_many(self, keys: Sequence[str]) -> List[Optional[str]]:
+        ...  # pragma: no cover
+
+    @abstractmethod
+    async def set_many(
+        self, mapping: Dict[str, str], ttl: Optional[float] = None
+    ) -> None:
+        ...  # pragma: no cover
+
+    @abstractmethod
+    async def delete_many(self, keys: Sequence[str]) -> None:
+        ...  # pragma: no cover
+
+    @abstractmethod
+    async def incr_many(
+        self, keys: Sequence[str], ttl: Optional[float] = None
+    ) -> List[int]:
+        """
+        Increments counters, setting `ttl` on counters that did not exist.
+        """
+        ...  # pragma: no cover
+
+    @abstractmethod
+    async def incr_and_get_many(
+        self,
+        incr_keys: Sequence[str],
+        get_keys: Sequence[str],
+        ttl: Optional[float] = None,
+    ) -> Tuple[List[int], List[Optional[str]]]:
+        """
+        Like `incr_many` on `incr_keys` and `get_many` on `get_keys`, in a
+        single round trip.
+        """
+        ...  # pragma: no cover
+
+    async def get(self, key: str) -> Optional[str]:
+        return (await self.get_many([key]))[0]
+
+    async def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        await self.set_many({key: value}, ttl)
+
+    async def delete(self, key: str) -> None:
+        await self.delete_many([key])
+
+    async def close(self) -> None:
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+
+class MemoryStore(SharedStore):
+    """
+    In-process implementation for tests and single-node deployments.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self.cache: LRUCache[Any] = LRUCache(maxsize=maxsize)
+
+    async def get_many(self, keys: Sequence[str]) -> List[Optional[str]]:
+        return [self.cache.get(key) for key in keys]
+
+    async def set_many(
+        self, mapping: Dict[str, str], ttl: Optional[float] = None
+    ) -> None:
+        if ttl is not None and ttl <= 0:
+            await self.delete_many(list(mapping))
+            return
+        for key, value in mapping.items():
+            self.cache.set(key, value, ttl)
+
+    async def delete_many(self, keys: Sequence[str]) -> None:
+        for key in keys:
+            self.cache.delete(key)
+
+    async def incr_many(
+        self, keys: Sequence[str], ttl: Optional[float] = None
+    ) -> List[int]:
+        return [self.cache.incr(key, ttl=ttl) for key in keys]
+
+    async def incr_and_get_many(
+        self,
+        incr_keys: Sequence[str],
+        get_keys: Sequence[str],
+        ttl: Optional[float] = None,
+    ) -> Tuple[List[int], List[Optional[str]]]:
+        return await self.incr_many(incr_keys, ttl), await self.get_many(get_keys)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "memory", **self.cache.stats()}
+
+
+def _milliseconds(ttl: float) -> int:
+    # Redis expiries are whole milliseconds; round up so that a short TTL
+    # does not become an immediate expiry
+    return ceil(ttl * 1000)
+
+
+# INCR that sets the expiry of the counters it creates, for any Redis version
+# (PEXPIRE NX needs Redis 7)
+INCR_SCRIPT = """
+local value = redis.call("INCR", KEYS[1])
+if value == 1 then
+    redis.call("PEXPIRE", KEYS[1], ARGV[1])
+end
+return value
+"""
+
+
+class RedisStore(SharedStore):
+    """
+    Redis implementation, batching every multi-key call into one pipeline.
+    """
+
+    def __init__(self, url: str) -> None:
+        try:
+            from redis import asyncio as aioredis
+        except ImportError as e:  # pragma: no cover
+            raise RuntimeError(
+                "The redis package is required when SHARED_STORE_URL is set"
+            ) from e
+
+        self.redis = aioredis.Redis.from_url(url, decode_responses=True)
+        self.incr_script = self.redis.register_script(INCR_SCRIPT)
+
+    async def get_many(self, keys: Sequence[str]) -> List[Optional[str]]:
+        if not keys:
+            return []
+        return await self.redis.mget(keys)
+
+    async def set_many(
+        self, mapping: Dict[str, str], ttl: Optional[float] = None
+    ) -> None:
+        if not mapping:
+            return
+        if ttl is not None and ttl <= 0:
+            await self.delete_many(list(mapping))
+            return
+        px = _milliseconds(ttl) if ttl is not None else None
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for key, value in mapping.items():
+                pipe.set(key, value, px=px)
+            await pipe.execute()
+
+    async def delete_many(self, keys: Sequence[str]) -> None:
+        if keys:
+            await self.redis.delete(*keys)
+
+    async def incr_many(
+        self, keys: Sequence[str], ttl: Optional[float] = None
+    ) -> List[int]:
+        if not keys:
+            return []
+        counts, _ = await self.incr_and_get_many(keys, [], ttl)
+        return counts
+
+    async def incr_and_get_many(
+        self,
+        incr_keys: Sequence[str],
+        get_keys: Sequence[str],
+        ttl: Optional[float] = None,
+    ) -> Tuple[List[int], List[Optional[str]]]:
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for key in incr_keys:
+                if ttl is None:
+                    pipe.incr(key)
+                else:
+                    # queued on the pipeline, which loads the script if needed
+                    await self.incr_script(
+                        keys=[key], args=[_milliseconds(ttl)], client=pipe
+                    )
+            if get_keys:
+                pipe.mget(get_keys)
+            results = await pipe.execute()
+        if get_keys:
+            return results[:-1], results[-1]
+        return results, []
+
+    async def close(self) -> None:
+        await self.redis.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "redis"}
+
+
+_store: Optional[SharedStore] = None
+
+
+def get_store() -> SharedStore:
+    """
+    Returns the process-wide shared store, creating it on first use.
+    """
+    global _store
+
+    if _store is None:
+        if settings.SHARED_STORE_URL:
+            _store = RedisStore(settings.SHARED_STORE_URL)
+        else:
+            _store = MemoryStore(maxsize=settings.SHARED_STORE_MAX_SIZE)
+
+    return _store
+
+
+async def close_store() -> None:
+    global _store
+
+    if _store is not None:
+        await _store.close()
+        _store = None
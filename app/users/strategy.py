@@ -0,0 +1,273 @@
+import asyncio
+import time
+import uuid
+from datetime import datetime, timedelta
+from hashlib import blake2b
+from typing import Any, Dict, List, Optional, Type, TypeVar
+
+import jwt
+from beanie import PydanticObjectId
+from bson.errors import InvalidId
+from fastapi_users import exceptions
+from fastapi_users.authentication import JWTStrategy
+from fastapi_users.jwt import decode_jwt, generate_jwt
+from fastapi_users.manager import BaseUserManager
+from pydantic import BaseModel, ValidationError
+
+from app.config.settings import settings
+from .cache import LRUCache
+from .db import User, projection
+from .keys import SigningKeys
+from .refresh import refresh_tokens
+from .revocation import revocation_list
+from .schemas import UserAuth, UserRead
+from .store import get_store
+
+P = TypeVar("P", bound=BaseModel)
+
+
+def user_revision_key(user_id: str) -> str:
+    return f"user:rev:{user_id}"
+
+
+async def mark_user_changed(user_id: str) -> None:
+    """
+    Records when a user document changed, so that tokens issued before
+    that time no longer have their claims trusted. Claims older than the
+    max staleness are rejected anyway, so the record expires with it.
+    """
+    await mark_users_changed([user_id])
+
+
+async def mark_users_changed(user_ids: List[str]) -> None:
+    changed_at = str(time.time())
+    await get_store().set_many(
+        {user_revision_key(user_id): changed_at for user_id in user_ids},
+        ttl=settings.JWT_CLAIMS_MAX_STALENESS_SECONDS,
+    )
+
+
+class ClaimsJWTStrategy(JWTStrategy):
+    """
+    JWT strategy that can embed the fields of `UserRead` in the token,
+    so read-only routes can authenticate without a database round trip.
+
+    Every token carries a `jti` so that it can be revoked on logout, and
+    the id of the refresh token family it was issued with, if any.
+
+    Recently verified tokens are remembered by digest until they expire,
+    so a repeated bearer token skips signature and claim validation.
+
+    :param stateless_claims: Whether to embed user claims in new tokens.
+    :param max_staleness_seconds: How long embedded claims are trusted.
+    :param decode_cache_size: How many verified tokens to remember.
+    :param signing_keys: Asymmetric keys to sign with instead of the secret.
+    """
+
+    def __init__(
+        self,
+        *args,
+        stateless_claims: bool = False,
+        max_staleness_seconds: int = 60,
+        decode_cache_size: int = 0,
+        signing_keys: Optional[SigningKeys] = None,
+        **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        self.signing_keys = signing_keys
+        if signing_keys is not None:
+            self.algorithm = signing_keys.algorithm
+        self.stateless_claims = stateless_claims
+        self.max_staleness_seconds = max_staleness_seconds
+        self.decode_cache: LRUCache[Dict[str, Any]] = LRUCache(
+            maxsize=decode_cache_size, ttl=self.lifetime_seconds
+        )
+
+    async def write_token(self, user: User, family_id: Optional[str] = None) -> str:
+        data = {
+            "sub": str(user.id),
+            "aud": self.token_audience,
+            "iat": int(time.time()),
+            "jti": uuid.uuid4().hex,
+        }
+        if family_id is not None:
+            data["fam"] = family_id
+        if self.stateless_claims:
+            try:
+                claims = UserRead.model_validate(user).model_dump(
+                    mode="json", exclude={"id"}
+                )
+            except ValidationError:
+                claims = None
+            if claims is not None:
+                data["usr"] = claims
+
+        return self._encode(data)
+
+    def _encode(self, data: Dict[str, Any]) -> str:
+        if self.signing_keys is None:
+            return generate_jwt(
+                data, self.encode_key, self.lifetime_seconds, algorithm=self.algorithm
+            )
+
+        if self.lifetime_seconds:
+            data["exp"] = datetime.utcnow() + timedelta(seconds=self.lifetime_seconds)
+        return jwt.encode(
+            data,
+            self.signing_keys.signing_key,
+            algorithm=self.algorithm,
+            headers={"kid": self.signing_keys.active_kid},
+        )
+
+    def _verify(self, token: str) -> Dict[str, Any]:
+        if self.signing_keys is None:
+            return decode_jwt(
+                token, self.decode_key, self.token_audience, algorithms=[self.algorithm]
+            )
+
+        kid = jwt.get_unverified_header(token).get("kid")
+        key = self.signing_keys.verification_key(kid)
+        if key is None:
+            raise jwt.InvalidKeyError(f"Unknown signing key id: {kid}")
+        return jwt.decode(
+            token, key, audience=self.token_audience, algorithms=[self.algorithm]
+        )
+
+    async def decode(self, token: Optional[str]) -> Optional[Dict[str, Any]]:
+        """
+        Returns the claims of a valid token that has not been revoked.
+        """
+        if token is None:
+            return None
+
+        digest = blake2b(token.encode(), digest_size=16).digest()
+        data = self.decode_cache.get(digest)
+        if data is None:
+            try:
+                data = self._verify(token)
+            except jwt.PyJWTError:
+                return None
+            if "exp" in data:
+                self.decode_cache.set(digest, data, ttl=data["exp"] - time.time())
+            else:
+                self.decode_cache.set(digest, data)
+
+        jti = data.get("jti")
+        if jti is not None and await revocation_list.is_revoked(jti):
+            return None
+        return data
+
+    async def read_token(
+        self, token: Optional[str], user_manager: BaseUserManager
+    ) -> Optional[User]:
+        data = await self.decode(token)
+        if data is None or data.get("sub") is None:
+            return None
+
+        try:
+            parsed_id = user_manager.parse_id(data["sub"])
+            return await user_manager.get(parsed_id)
+        except (exceptions.UserNotExists, exceptions.InvalidID):
+            return None
+
+    async def read_projected(
+        self, token: Optional[str], user_manager: BaseUserManager, model: Type[P]
+    ) -> Optional[P]:
+        """
+        Like `read_token`, but only loads the fields of `model`.
+        """
+        data = await self.decode(token)
+        if data is None or data.get("sub") is None:
+            return None
+
+        try:
+            parsed_id = user_manager.parse_id(data["sub"])
+            return await user_manager.get_projected(parsed_id, model)
+        except (exceptions.UserNotExists, exceptions.InvalidID):
+            return None
+
+    async def destroy_token(self, token: str, user: User) -> None:
+        data = await self.decode(token)
+        if data is None or data.get("jti") is None:
+            return
+
+        expires_at = (
+            datetime.utcfromtimestamp(data["exp"]) if "exp" in data else datetime.max
+        )
+        await revocation_list.revoke(data["jti"], user.id, expires_at)
+        if data.get("fam") is not None:
+            await refresh_tokens.revoke_family(data["fam"])
+
+    async def read_claims(self, token: Optional[str]) -> Optional[UserRead]:
+        """
+        Returns the user embedded in the token, or None when the token
+        carries no claims or the claims may be stale.
+        """
+        data = await self.decode(token)
+        if data is None:
+            return None
+
+        user_id = data.get("sub")
+        claims = data.get("usr")
+        issued_at = data.get("iat")
+        if user_id is None or claims is None or issued_at is None:
+            return None
+        if time.time() - issued_at > self.max_staleness_seconds:
+            return None
+        changed_at = await get_store().get(user_revision_key(user_id))
+        if changed_at is not None and float(changed_at) >= issued_at:
+            return None
+
+        try:
+            return UserRead(id=user_id, **claims)
+        except ValidationError:
+            return None
+
+    async def introspect(self, tokens: List[str]) -> List[Dict[str, Any]]:
+        """
+        Returns RFC 7662 style introspection results, in order, for a batch
+        of tokens. The users they reference are loaded with a single query;
+        tokens of missing or inactive users are reported inactive.
+        """
+        decoded = await asyncio.gather(*(self.decode(token) for token in tokens))
+
+        user_ids = {}
+        for data in decoded:
+            if data is not None and data.get("sub") is not None:
+                try:
+                    user_ids[data["sub"]] = PydanticObjectId(data["sub"])
+                except (InvalidId, TypeError):
+                    pass
+
+        users = {}
+        if user_ids:
+            cursor = User.get_motor_collection().find(
+                {"_id": {"$in": list(set(user_ids.values()))}},
+                projection(UserAuth),
+            )
+            async for document in cursor:
+                users[document["_id"]] = document
+
+        results = []
+        for data in decoded:
+            user = None
+            if data is not None and data.get("sub") in user_ids:
+                user = users.get(user_ids[data["sub"]])
+            if user is None or not user.get("is_active", True):
+                results.append({"active": False})
+                continue
+            results.append(
+                {
+                    "active": True,
+                    "token_type": "access_token",
+                    "sub": data["sub"],
+                    "username": user["email"],
+                    "aud": data.get("aud"),
+                    "exp": data.get("exp"),
+                    "iat": data.get("iat"),
+                    "jti": data.get("jti"),
+                    "is_verified": user.get("is_verified", False),
+                    "is_superuser": user.get("is_superuser", False),
+                }
+            )
+        return results
@@ -1,32 +1,118 @@
 from beanie import PydanticObjectId
-from fastapi import Depends
+from fastapi import Depends, HTTPException, Response, status
+from fastapi.responses import JSONResponse
 from fastapi_users import FastAPIUsers
 from fastapi_users.authentication import (
     AuthenticationBackend,
     BearerTransport,
-    JWTStrategy,
 )
 from fastapi_users.db import BeanieUserDatabase
+from fastapi_users.openapi import OpenAPIResponseType
+from typing import Optional
 from .db import User, get_user_db
 from app.config.settings import settings
 from .manager import CustomUserManager
+from .hashing import password_helper
+from .keys import JWKS, load_signing_keys
+from .refresh import refresh_tokens
+from .schemas import TokenPairResponse, UserAuth, UserRead
+from .strategy import ClaimsJWTStrategy
 
 
 async def get_user_manager(user_db: BeanieUserDatabase = Depends(get_user_db)):
-    yield CustomUserManager(user_db)
+    yield CustomUserManager(user_db, password_helper)
 
 
-bearer_transport = BearerTransport(tokenUrl="auth/jwt/login")
+class RefreshBearerTransport(BearerTransport):
+    async def get_token_pair_response(
+        self, access_token: str, refresh_token: str
+    ) -> Response:
+        token_pair = TokenPairResponse(
+            access_token=access_token, refresh_token=refresh_token, token_type="bearer"
+        )
+        return JSONResponse(token_pair.model_dump())
 
+    @staticmethod
+    def get_openapi_login_responses_success() -> OpenAPIResponseType:
+        return {status.HTTP_200_OK: {"model": TokenPairResponse}}
 
-def get_jwt_strategy() -> JWTStrategy:
-    return JWTStrategy(secret=settings.SECRET_KEY, lifetime_seconds=3600)
 
+class RefreshAuthenticationBackend(AuthenticationBackend):
+    """
+    Authentication backend whose login also issues a refresh token,
+    in a new family shared by every token obtained by refreshing it.
+    """
 
-auth_backend = AuthenticationBackend(
+    transport: RefreshBearerTransport
+
+    async def login(self, strategy: ClaimsJWTStrategy, user: User) -> Response:
+        refresh_token, family_id = await refresh_tokens.issue(user.id)
+        access_token = await strategy.write_token(user, family_id=family_id)
+        return await self.transport.get_token_pair_response(access_token, refresh_token)
+
+
+bearer_transport = RefreshBearerTransport(tokenUrl="auth/jwt/login")
+
+
+signing_keys = load_signing_keys()
+jwks = JWKS(signing_keys)
+
+jwt_strategy = ClaimsJWTStrategy(
+    secret=settings.SECRET_KEY,
+    lifetime_seconds=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+    stateless_claims=settings.JWT_STATELESS_CLAIMS,
+    max_staleness_seconds=settings.JWT_CLAIMS_MAX_STALENESS_SECONDS,
+    decode_cache_size=settings.JWT_DECODE_CACHE_SIZE,
+    algorithm=settings.JWT_ALGORITHM,
+    signing_keys=signing_keys,
+)
+
+
+def get_jwt_strategy() -> ClaimsJWTStrategy:
+    return jwt_strategy
+
+
+auth_backend = RefreshAuthenticationBackend(
     name="jwt",
     transport=bearer_transport,
     get_strategy=get_jwt_strategy,
 )
 
 fastapi_users = FastAPIUsers[User, PydanticObjectId](get_user_manager, [auth_backend])
+
+
+async def current_superuser(
+    token: Optional[str] = Depends(bearer_transport.scheme),
+    strategy: ClaimsJWTStrategy = Depends(get_jwt_strategy),
+    user_manager: CustomUserManager = Depends(get_user_manager),
+) -> UserAuth:
+    """
+    Resolves the active current user, who must be a superuser, loading
+    only the fields needed to authorize the request.
+    """
+    user = await strategy.read_projected(token, user_manager, UserAuth)
+    if user is None or not user.is_active:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
+    if not user.is_superuser:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN)
+    return user
+
+
+async def current_user_read(
+    token: Optional[str] = Depends(bearer_transport.scheme),
+    strategy: ClaimsJWTStrategy = Depends(get_jwt_strategy),
+    user_manager: CustomUserManager = Depends(get_user_manager),
+) -> UserRead:
+    """
+    Resolves the active, verified current user from the token claims when
+    they are fresh enough, falling back to the database otherwise.
+    """
+    user = await strategy.read_claims(token)
+    if user is None:
+        user = await strategy.read_projected(token, user_manager, UserRead)
+
+    if user is None or not user.is_active:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
+    if not user.is_verified:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN)
+    return user
@@ -0,0 +1,300 @@
+"""
+Load test for the auth endpoints.
+
+Runs `app.main:app` in-process over an ASGI transport against the MongoDB
+at MONGODB_URL, in a throwaway database, and drives the register, login,
+verify, `/users/me`, `PATCH /users/me` and forgot/reset password flows with
+many concurrent users. Reports throughput and latency percentiles per
+endpoint, and compares them against a stored baseline:
+
+    docker run -d -p 27017:27017 mongo:7
+    MONGODB_URL=mongodb://localhost:27017 python -m benchmarks.load \\
+        --users 200 --concurrency 20 --save-baseline
+    MONGODB_URL=mongodb://localhost:27017 python -m benchmarks.load \\
+        --users 200 --concurrency 20
+"""
+
+import os
+
+# Settings are read on import, so point the app at its own database first.
+os.environ["DB_NAME"] = os.environ.get("BENCHMARK_DB_NAME", "fastapi_auth_benchmark")
+os.environ.setdefault("MONGODB_URL", "mongodb://localhost:27017")
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "60")
+# every simulated user shares one client address
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+from collections import defaultdict
+from fastapi_users.jwt import generate_jwt
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from app.config.settings import get_db, settings
+from app.main import app
+from app.users.hashing import password_hasher
+from app.users.manager import CustomUserManager
+import argparse
+import asyncio
+import httpx
+import json
+import math
+import sys
+import time
+
+
+BASELINE_PATH = Path(__file__).resolve().parent / "baseline.json"
+PASSWORD = "Password#123"
+
+
+class Recorder:
+    """
+    Latencies of every request, by endpoint.
+    """
+
+    def __init__(self) -> None:
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    async def request(
+        self,
+        client: httpx.AsyncClient,
+        name: str,
+        method: str,
+        url: str,
+        expected: int,
+        **kwargs,
+    ) -> httpx.Response:
+        started = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        self.latencies[name].append(time.perf_counter() - started)
+        if response.status_code != expected:
+            self.errors[name] += 1
+        return response
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(recorder: Recorder, elapsed: float) -> Dict[str, Dict[str, Any]]:
+    return {
+        name: {
+            "requests": len(latencies),
+            "errors": recorder.errors[name],
+            "throughput": round(len(latencies) / elapsed, 2),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        }
+        for name, latencies in sorted(recorder.latencies.items())
+    }
+
+
+def compare(
+    results: Dict[str, Dict[str, Any]],
+    baseline: Dict[str, Dict[str, Any]],
+    tolerance: float,
+) -> List[str]:
+    """
+    Returns a message for every percentile that is slower than the
+    baseline by more than `tolerance`.
+    """
+    regressions = []
+    for name, expected in baseline.items():
+        current = results.get(name)
+        if current is None:
+            continue
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            if current[key] > expected[key] * (1 + tolerance):
+                regressions.append(
+                    f"{name} {key}: {current[key]} > {expected[key]} (baseline)"
+                )
+    return regressions
+
+
+async def user_flow(
+    client: httpx.AsyncClient, recorder: Recorder, index: int, iterations: int
+) -> None:
+    email = f"bench-{index}@example.com"
+    await recorder.request(
+        client,
+        "register",
+        "POST",
+        "/auth/register",
+        201,
+        json={
+            "email": email,
+            "password": PASSWORD,
+            "first_name": "Bench",
+            "last_name": "User",
+        },
+    )
+    user = await get_db()["User"].find_one({"email": email})
+    if user is None:
+        return
+
+    verify_token = generate_jwt(
+        {
+            "sub": str(user["_id"]),
+            "email": email,
+            "aud": CustomUserManager.verification_token_audience,
+        },
+        CustomUserManager.verification_token_secret,
+        CustomUserManager.verification_token_lifetime_seconds,
+    )
+    await recorder.request(
+        client, "verify", "POST", "/auth/verify", 200, json={"token": verify_token}
+    )
+
+    login = await recorder.request(
+        client,
+        "login",
+        "POST",
+        "/auth/jwt/login",
+        200,
+        data={"username": email, "password": PASSWORD},
+    )
+    if login.status_code != 200:
+        return
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+    for _ in range(iterations):
+        await recorder.request(
+            client, "users_me", "GET", "/users/me", 200, headers=headers
+        )
+    await recorder.request(
+        client,
+        "users_me_patch",
+        "PATCH",
+        "/users/me",
+        200,
+        headers=headers,
+        json={"first_name": f"Bench{index}"},
+    )
+
+    await recorder.request(
+        client,
+        "forgot_password",
+        "POST",
+        "/auth/forgot-password",
+        202,
+        json={"email": email},
+    )
+    reset_token = generate_jwt(
+        {
+            "sub": str(user["_id"]),
+            "password_fgpt": await password_hasher.hash(user["hashed_password"]),
+            "aud": CustomUserManager.reset_password_token_audience,
+        },
+        CustomUserManager.reset_password_token_secret,
+        CustomUserManager.reset_password_token_lifetime_seconds,
+    )
+    await recorder.request(
+        client,
+        "reset_password",
+        "POST",
+        "/auth/reset-password",
+        200,
+        json={"token": reset_token, "password": PASSWORD},
+    )
+
+
+async def run(users: int, concurrency: int, iterations: int) -> Dict[str, Any]:
+    recorder = Recorder()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited(client: httpx.AsyncClient, index: int) -> None:
+        async with semaphore:
+            await user_flow(client, recorder, index, iterations)
+
+    async with app.router.lifespan_context(app):
+        await get_db().client.drop_database(settings.DB_NAME)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://benchmark", follow_redirects=True
+        ) as client:
+            started = time.perf_counter()
+            await asyncio.gather(*(limited(client, i) for i in range(users)))
+            elapsed = time.perf_counter() - started
+        await get_db().client.drop_database(settings.DB_NAME)
+
+    return {
+        "users": users,
+        "concurrency": concurrency,
+        "iterations": iterations,
+        "elapsed_seconds": round(elapsed, 2),
+        "endpoints": summarize(recorder, elapsed),
+    }
+
+
+def print_report(report: Dict[str, Any], baseline: Optional[Dict[str, Any]]) -> None:
+    print(
+        f"{report['users']} users, concurrency {report['concurrency']}, "
+        f"{report['elapsed_seconds']}s"
+    )
+    print(
+        f"{'endpoint':<18}{'requests':>10}{'errors':>8}{'req/s':>10}"
+        f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'p95 vs base':>14}"
+    )
+    for name, result in report["endpoints"].items():
+        delta = ""
+        if baseline and name in baseline["endpoints"]:
+            expected = baseline["endpoints"][name]["p95_ms"]
+            delta = f"{(result['p95_ms'] / expected - 1) * 100:+.1f}%"
+        print(
+            f"{name:<18}{result['requests']:>10}{result['errors']:>8}"
+            f"{result['throughput']:>10}{result['p50_ms']:>10}"
+            f"{result['p95_ms']:>10}{result['p99_ms']:>10}{delta:>14}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test the auth endpoints.")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument(
+        "--iterations", type=int, default=10, help="GET /users/me per user"
+    )
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument(
+        "--save-baseline", action="store_true", help="Store this run as the baseline"
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="Allowed slowdown against the baseline, as a fraction",
+    )
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args.users, args.concurrency, args.iterations))
+
+    baseline = None
+    if not args.save_baseline and args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text())
+    print_report(report, baseline)
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"Baseline saved to {args.baseline}")
+        return
+
+    failed = any(result["errors"] for result in report["endpoints"].values())
+    if baseline is not None:
+        if (baseline["users"], baseline["concurrency"]) != (
+            report["users"],
+            report["concurrency"],
+        ):
+            print("Warning: the baseline was recorded with a different load")
+        regressions = compare(
+            report["endpoints"], baseline["endpoints"], args.tolerance
+        )
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        failed = failed or bool(regressions)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
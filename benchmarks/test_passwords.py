@@ -0,0 +1,69 @@
+import asyncio
+import pytest
+from fastapi_users.exceptions import InvalidPasswordException
+from app.users.hashing import password_helper
+from app.users.manager import CustomUserManager, check_password_strength
+from app.users.schemas import UserCreate
+
+
+PASSWORDS = {
+    "typical": "Password#123",
+    "long": "Correct-Horse-Battery-Staple-1" * 4,
+    # nothing for the lookaheads to find, so each one scans the whole input
+    "adversarial_1k": "a" * 1000,
+    "adversarial_10k": "aA1" * 3333 + "~",
+    # the longest password passlib accepts
+    "max_size": "aA1!" * 1024,
+}
+
+
+@pytest.fixture(scope="module")
+def loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+@pytest.fixture(scope="module")
+def user() -> UserCreate:
+    return UserCreate(
+        email="benchmark@example.com",
+        password="Password#123",
+        first_name="Bench",
+        last_name="Mark",
+    )
+
+
+@pytest.mark.benchmark(group="check_password_strength")
+@pytest.mark.parametrize("name", PASSWORDS)
+def test_check_password_strength(benchmark, name: str):
+    benchmark(check_password_strength, PASSWORDS[name])
+
+
+@pytest.mark.benchmark(group="validate_password")
+@pytest.mark.parametrize("name", PASSWORDS)
+def test_validate_password(benchmark, loop, user: UserCreate, name: str):
+    manager = CustomUserManager(None)
+
+    def validate():
+        try:
+            loop.run_until_complete(manager.validate_password(PASSWORDS[name], user))
+        except InvalidPasswordException:
+            pass
+
+    benchmark(validate)
+
+
+@pytest.mark.benchmark(group="password_helper")
+@pytest.mark.parametrize("name", ["typical", "max_size"])
+def test_password_helper_hash(benchmark, name: str):
+    benchmark.pedantic(password_helper.hash, args=(PASSWORDS[name],), rounds=5)
+
+
+@pytest.mark.benchmark(group="password_helper")
+@pytest.mark.parametrize("name", ["typical", "max_size"])
+def test_password_helper_verify(benchmark, name: str):
+    hashed = password_helper.hash(PASSWORDS[name])
+    benchmark.pedantic(
+        password_helper.verify_and_update, args=(PASSWORDS[name], hashed), rounds=5
+    )
@@ -0,0 +1,53 @@
+import pytest
+from datetime import datetime
+from beanie import PydanticObjectId
+from app.users.schemas import UserCreate, UserRead, UserUpdate
+
+
+@pytest.fixture
+def user_read_data():
+    return {
+        "id": PydanticObjectId("6549808b53e310b880d3aafa"),
+        "email": "benchmark@example.com",
+        "is_active": True,
+        "is_superuser": False,
+        "is_verified": True,
+        "first_name": "Bench",
+        "last_name": "Mark",
+        "created_at": datetime(2023, 1, 1),
+        "last_login": datetime(2023, 6, 1),
+    }
+
+
+@pytest.mark.benchmark(group="schemas")
+def test_user_create_validate(benchmark):
+    data = {
+        "email": "benchmark@example.com",
+        "password": "Password#123",
+        "first_name": "Bench",
+        "last_name": "Mark",
+    }
+    benchmark(UserCreate.model_validate, data)
+
+
+@pytest.mark.benchmark(group="schemas")
+def test_user_update_validate(benchmark):
+    data = {"first_name": "Bench", "last_name": "Mark", "password": "Password#123"}
+    benchmark(UserUpdate.model_validate, data)
+
+
+@pytest.mark.benchmark(group="schemas")
+def test_user_update_create_update_dict(benchmark):
+    user_update = UserUpdate(first_name="Bench", password="Password#123")
+    benchmark(user_update.create_update_dict)
+
+
+@pytest.mark.benchmark(group="schemas")
+def test_user_read_validate(benchmark, user_read_data):
+    benchmark(UserRead.model_validate, user_read_data)
+
+
+@pytest.mark.benchmark(group="schemas")
+def test_user_read_dump_json(benchmark, user_read_data):
+    user_read = UserRead.model_validate(user_read_data)
+    benchmark(user_read.model_dump_json)
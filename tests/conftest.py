@@ -1,3 +1,8 @@
+import os
+
+# tests must never send real e-mails
+os.environ["MAIL_TRANSPORT"] = "memory"
+
 import pytest
 from fastapi import FastAPI
 from motor.motor_asyncio import AsyncIOMotorDatabase
@@ -1,6 +1,6 @@
 import pytest
 import os
-from app.config.settings import Settings
+from app.config.settings import Settings, get_client, get_db
 from motor.motor_asyncio import AsyncIOMotorDatabase
 
 
@@ -17,3 +17,15 @@ def test_settings(settings: Settings):
 async def test_db_connection(settings: Settings, database: AsyncIOMotorDatabase):
     assert await database.command("ping")
     assert database.name == settings.DB_NAME
+
+
+def test_get_db_shares_client(settings: Settings):
+    assert get_db().client is get_db().client
+    assert get_client() is get_db().client
+
+
+def test_client_pool_options(settings: Settings):
+    pool_options = get_client().options.pool_options
+
+    assert pool_options.max_pool_size == settings.MONGODB_MAX_POOL_SIZE
+    assert pool_options.min_pool_size == settings.MONGODB_MIN_POOL_SIZE
@@ -0,0 +1,66 @@
+import hashlib
+import pytest
+from pathlib import Path
+from types import SimpleNamespace
+from app.users.breached import BreachedPasswordIndex, build_index, read_digests
+from app.users.policy import BreachedPasswordRule, PasswordPolicy
+
+
+BREACHED = ["Password#123", "Qwerty!123", "Letmein@1", "Dragon#2023"]
+
+
+@pytest.fixture
+def index_path(tmp_path: Path) -> Path:
+    lines = [
+        f"{hashlib.sha1(password.encode()).hexdigest().upper()}:{count}\n"
+        for count, password in enumerate(BREACHED, start=1)
+    ]
+    path = tmp_path / "breached.idx"
+    # a tiny chunk size exercises the external merge
+    build_index(read_digests(lines, "sha1", 10, 1), path, chunk_records=3)
+    return path
+
+
+def test_index_lookup(index_path: Path):
+    index = BreachedPasswordIndex(index_path)
+
+    assert len(index) == len(BREACHED)
+    for password in BREACHED:
+        assert password in index
+    assert "Abc@1234" not in index
+    index.close()
+
+
+def test_build_index_deduplicates_and_filters(tmp_path: Path):
+    lines = ["Password#123", "Password#123", "Abc@1234", ""]
+    path = tmp_path / "breached.idx"
+
+    assert build_index(read_digests(lines, "plain", 8, 1), path, record_size=8) == 2
+    assert "Abc@1234" in BreachedPasswordIndex(path)
+
+    sha1 = hashlib.sha1(b"Abc@1234").hexdigest()
+    count = build_index(read_digests([f"{sha1}:1"], "sha1", 8, 2), path, record_size=8)
+    assert count == 0
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_index_rejects_invalid_file(tmp_path: Path):
+    path = tmp_path / "invalid.idx"
+    path.write_bytes(b"not an index at all")
+
+    with pytest.raises(ValueError):
+        BreachedPasswordIndex(path)
+
+
+def test_breached_password_rule(index_path: Path):
+    policy = PasswordPolicy(
+        min_length=8,
+        max_length=64,
+        rules=[BreachedPasswordRule(BreachedPasswordIndex(index_path))],
+    )
+    user = SimpleNamespace(email="x@example.com", first_name="", last_name="")
+
+    assert policy.validate("Abc@1234", user) == []
+    assert policy.validate("Password#123", user) == [
+        "Password has appeared in a data breach"
+    ]
@@ -0,0 +1,58 @@
+import pytest
+from bson import ObjectId
+from datetime import datetime
+from typing import AsyncIterator, List
+from app.users.bulk import _csv_value, iter_lines, parse_user
+
+
+async def chunks(*data: bytes) -> AsyncIterator[bytes]:
+    for chunk in data:
+        yield chunk
+
+
+@pytest.mark.asyncio
+async def test_iter_lines() -> None:
+    lines: List[bytes] = [
+        line async for line in iter_lines(chunks(b'{"a"', b": 1}\n{}\n\n{", b"}"))
+    ]
+
+    assert lines == [b'{"a": 1}', b"{}", b"", b"{}"]
+
+
+def test_parse_user() -> None:
+    user = parse_user(
+        b'{"email": "john@example.com", "password": "Password#123",'
+        b' "first_name": "John", "last_name": "Doe", "is_verified": true}'
+    )
+
+    assert user.email == "john@example.com"
+    assert user.is_verified
+
+
+@pytest.mark.parametrize(
+    "line,error",
+    [
+        (b"not json", "Invalid JSON"),
+        (b'{"email": "john@example.com", "password": "x"}', "first_name"),
+        (
+            b'{"email": "john@example.com", "password": "password",'
+            b' "first_name": "John", "last_name": "Doe"}',
+            "Password must contain",
+        ),
+    ],
+)
+def test_parse_user_invalid(line: bytes, error: str) -> None:
+    with pytest.raises(ValueError) as excinfo:
+        parse_user(line)
+
+    assert error in str(excinfo.value)
+
+
+def test_csv_value() -> None:
+    assert _csv_value(None) == ""
+    assert _csv_value(True) == "true"
+    assert _csv_value(ObjectId("654090eac1a115c710f34435")) == (
+        "654090eac1a115c710f34435"
+    )
+    assert _csv_value(datetime(2023, 11, 1)) == "2023-11-01T00:00:00"
+    assert _csv_value("John") == "John"
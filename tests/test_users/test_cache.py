@@ -0,0 +1,61 @@
+import time
+from app.users.cache import LRUCache
+
+
+def test_lru_cache_get_set():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+    assert len(cache) == 2
+
+
+def test_lru_cache_ttl():
+    cache = LRUCache(maxsize=2, ttl=0.01)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=60)
+    time.sleep(0.02)
+
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+
+
+def test_lru_cache_delete():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.delete("a")
+    cache.delete("missing")
+
+    assert cache.get("a") is None
+
+
+def test_lru_cache_incr():
+    cache = LRUCache(maxsize=2)
+
+    assert cache.incr("a", ttl=60) == 1
+    assert cache.incr("a") == 2
+    assert cache.incr("a", amount=3) == 5
+
+
+def test_lru_cache_disabled():
+    cache = LRUCache(maxsize=0)
+    cache.set("a", 1)
+
+    assert cache.get("a") is None
+    assert cache.stats()["evictions"] == 0
@@ -1,10 +1,232 @@
+import asyncio
+import json
 import pytest
-from app.users.db import User, get_user_db
-from fastapi_users.db import BeanieUserDatabase
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from beanie import PydanticObjectId
+from fastapi.testclient import TestClient
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.collation import Collation
+from app.config.settings import Settings
+from app.users.db import (
+    User,
+    CachedUserDatabase,
+    UserWriteBuffer,
+    UserDatabase,
+    get_user_db,
+    projection,
+    user_cache_keys,
+)
+from app.users.schemas import UserAuth
+from app.users.store import MemoryStore, get_store
 
 
 @pytest.mark.asyncio
 async def test_get_user_db() -> None:
     async for user_db in get_user_db():
-        assert isinstance(user_db, BeanieUserDatabase)
+        assert isinstance(user_db, UserDatabase)
         assert user_db.user_model == User
+
+
+@pytest.mark.asyncio
+async def test_get_user_db_cached(settings: Settings) -> None:
+    async for user_db in get_user_db():
+        assert isinstance(user_db, CachedUserDatabase) == settings.USER_CACHE_ENABLED
+        if settings.USER_CACHE_ENABLED:
+            assert user_db.store is get_store()
+            assert user_db.ttl == settings.USER_CACHE_TTL_SECONDS
+
+
+def test_user_cache_keys() -> None:
+    assert user_cache_keys("654090eac1a115c710f34435", "John@Example.com") == [
+        "user:id:654090eac1a115c710f34435",
+        "user:id:654090eac1a115c710f34435:UserAuth",
+        "user:id:654090eac1a115c710f34435:UserRead",
+        "user:email:john@example.com",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_cached_user_database_invalidate() -> None:
+    store = MemoryStore(maxsize=10)
+    user_db = CachedUserDatabase(User, store)
+    keys = user_cache_keys("654090eac1a115c710f34435", "john@example.com")
+    await store.set_many(dict.fromkeys(keys, "{}"))
+
+    await user_db.invalidate("654090eac1a115c710f34435", "John@Example.com")
+
+    assert await store.get_many(keys) == [None] * len(keys)
+
+
+@pytest.mark.asyncio
+async def test_cached_user_database_omits_password_hash() -> None:
+    store = MemoryStore(maxsize=10)
+    user_db = CachedUserDatabase(User, store)
+    user = User.model_construct(
+        id=PydanticObjectId("654090eac1a115c710f34435"),
+        email="john@example.com",
+        hashed_password="hash",
+    )
+
+    await user_db._cache_user(user)
+
+    cached = json.loads(await store.get(user_cache_keys(user.id)[0]))
+    assert cached["email"] == "john@example.com"
+    assert "hashed_password" not in cached
+
+
+def test_projection() -> None:
+    assert projection(UserAuth) == {
+        "email": 1,
+        "is_active": 1,
+        "is_superuser": 1,
+        "is_verified": 1,
+    }
+
+
+@pytest.mark.asyncio
+async def test_user_database_update_nothing() -> None:
+    user = User.model_construct(
+        id=PydanticObjectId("654090eac1a115c710f34435"),
+        email="john@example.com",
+        hashed_password="hash",
+    )
+
+    assert await UserDatabase(User).update(user, {}) is user
+
+
+@pytest.mark.asyncio
+async def test_cached_user_database_get_projected_hit() -> None:
+    store = MemoryStore(maxsize=10)
+    user_db = CachedUserDatabase(User, store)
+    keys = user_cache_keys("654090eac1a115c710f34435")
+    await store.set_many(
+        dict.fromkeys(
+            keys,
+            '{"id": "654090eac1a115c710f34435", "email": "john@example.com", '
+            '"first_name": "John", "is_active": true, "is_superuser": false, '
+            '"is_verified": true}',
+        )
+    )
+
+    user = await user_db.get_projected("654090eac1a115c710f34435", UserAuth)
+
+    assert user.model_dump(mode="json") == {
+        "id": "654090eac1a115c710f34435",
+        "email": "john@example.com",
+        "is_active": True,
+        "is_superuser": False,
+        "is_verified": True,
+    }
+    assert isinstance(user.id, PydanticObjectId)
+    assert not hasattr(user, "first_name")
+
+
+@pytest.mark.asyncio
+async def test_user_write_buffer_coalesces() -> None:
+    user = User.model_construct(
+        id=PydanticObjectId(), email="john@example.com", hashed_password="hashed"
+    )
+    buffer = UserWriteBuffer(interval=1, max_batch=10)
+    buffer.add(user, last_login=datetime(2023, 1, 1))
+    buffer.add(user, last_login=datetime(2023, 1, 2), first_name="John")
+
+    assert buffer.pending == {
+        user.id: {"last_login": datetime(2023, 1, 2), "first_name": "John"}
+    }
+
+
+@pytest.mark.asyncio
+async def test_user_write_buffer_compare_and_set() -> None:
+    user = User.model_construct(
+        id=PydanticObjectId(), email="john@example.com", hashed_password="old"
+    )
+    buffer = UserWriteBuffer(interval=1, max_batch=10)
+    buffer.add(user, last_login=datetime(2023, 1, 1))
+    buffer.compare_and_set(user, "hashed_password", "old", "new")
+
+    assert buffer.pending == {user.id: {"last_login": datetime(2023, 1, 1)}}
+    assert buffer.guarded == {user.id: {"hashed_password": ("old", "new")}}
+    assert buffer.emails == {user.id: "john@example.com"}
+
+
+@pytest.mark.asyncio
+async def test_user_write_buffer_empty_flush() -> None:
+    buffer = UserWriteBuffer(interval=1, max_batch=10)
+    buffer.start()
+
+    assert await buffer.flush() == 0
+    await buffer.stop()
+
+
+@pytest.mark.asyncio
+async def test_user_write_buffer_survives_flush_errors(monkeypatch) -> None:
+    buffer = UserWriteBuffer(interval=0.01, max_batch=10)
+    calls = []
+
+    async def flush() -> int:
+        calls.append(None)
+        raise RuntimeError("store unavailable")
+
+    monkeypatch.setattr(buffer, "flush", flush)
+    buffer.start()
+    await asyncio.sleep(0.05)
+
+    assert len(calls) > 1
+    monkeypatch.undo()
+    await buffer.stop()
+
+
+def winning_stages(explain: Dict[str, Any]) -> List[str]:
+    stages = []
+    plan = explain["queryPlanner"]["winningPlan"]
+    plan = plan.get("queryPlan", plan)
+    pending = [plan]
+    while pending:
+        stage = pending.pop()
+        stages.append(stage["stage"])
+        pending.extend(stage.get("inputStages", []))
+        if "inputStage" in stage:
+            pending.append(stage["inputStage"])
+    return stages
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "query, sort, collation",
+    [
+        ({"email": "john@example.com"}, None, Collation("en", strength=2)),
+        ({}, [("created_at", 1), ("_id", 1)], None),
+        (
+            {"is_active": True, "is_verified": False},
+            [("created_at", 1), ("_id", 1)],
+            None,
+        ),
+        (
+            {"is_verified": False, "created_at": {"$lt": datetime(2023, 1, 1)}},
+            None,
+            None,
+        ),
+        ({"last_login": {"$gte": datetime(2023, 1, 1)}}, None, None),
+        (
+            {"oauth_accounts.oauth_name": "google", "oauth_accounts.account_id": "1"},
+            None,
+            None,
+        ),
+    ],
+)
+async def test_user_queries_use_indexes(
+    client: TestClient,
+    database: AsyncIOMotorDatabase,
+    query: Dict[str, Any],
+    sort: Optional[List[Tuple[str, int]]],
+    collation: Optional[Collation],
+) -> None:
+    cursor = database["User"].find(query, collation=collation)
+    if sort is not None:
+        cursor = cursor.sort(sort)
+    stages = winning_stages(await cursor.explain())
+
+    assert "IXSCAN" in stages
+    assert "COLLSCAN" not in stages
+    assert "SORT" not in stages
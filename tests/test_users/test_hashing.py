@@ -0,0 +1,120 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import pytest
+from app.config.settings import Settings
+from app.users.hashing import (
+    HashingQueueFull,
+    PasswordHasher,
+    build_crypt_context,
+    calibrate,
+    password_hasher,
+)
+
+
+@pytest.fixture
+async def hasher():
+    hasher = PasswordHasher(executor="thread", workers=1, max_queue=0)
+    yield hasher
+    await hasher.shutdown()
+
+
+def test_password_hasher_from_settings(settings: Settings):
+    assert password_hasher.executor_type == settings.PASSWORD_HASHING_EXECUTOR
+    assert password_hasher.workers == settings.PASSWORD_HASHING_WORKERS
+    assert password_hasher.max_queue == settings.PASSWORD_HASHING_MAX_QUEUE
+
+
+@pytest.mark.asyncio
+async def test_password_hasher_executor_type():
+    thread_hasher = PasswordHasher(executor="thread", workers=1, max_queue=0)
+    process_hasher = PasswordHasher(executor="process", workers=1, max_queue=0)
+
+    assert isinstance(thread_hasher.executor, ThreadPoolExecutor)
+    assert isinstance(process_hasher.executor, ProcessPoolExecutor)
+
+    await thread_hasher.shutdown()
+    await process_hasher.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_hash_and_verify(hasher: PasswordHasher):
+    hashed_password = await hasher.hash("Password#123")
+
+    verified, _ = await hasher.verify_and_update("Password#123", hashed_password)
+    assert verified
+
+    verified, _ = await hasher.verify_and_update("Password#124", hashed_password)
+    assert not verified
+
+    metrics = hasher.metrics.snapshot()
+    assert metrics["completed"] == 3
+    assert metrics["rejected"] == 0
+    assert metrics["hash_time_avg_ms"] > 0
+    assert hasher.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_hash_rejected_when_queue_full(hasher: PasswordHasher):
+    results = await asyncio.gather(
+        hasher.hash("Password#123"),
+        hasher.hash("Password#123"),
+        return_exceptions=True,
+    )
+
+    assert isinstance(results[0], str)
+    assert isinstance(results[1], HashingQueueFull)
+    assert hasher.metrics.snapshot()["rejected"] == 1
+
+
+def test_crypt_context_upgrades_other_parameters():
+    context = build_crypt_context("bcrypt", 5, 1, 1024, 1)
+    old_hash = build_crypt_context("bcrypt", 4, 1, 1024, 1).hash("Abc@1234")
+
+    verified, new_hash = context.verify_and_update("Abc@1234", old_hash)
+
+    assert verified
+    assert new_hash.startswith("$2b$05$")
+    assert context.verify_and_update("Abc@1234", new_hash) == (True, None)
+
+
+def test_crypt_context_upgrades_other_scheme():
+    pytest.importorskip("argon2")
+    context = build_crypt_context("argon2", 4, 1, 1024, 1)
+    old_hash = build_crypt_context("bcrypt", 4, 1, 1024, 1).hash("Abc@1234")
+
+    verified, new_hash = context.verify_and_update("Abc@1234", old_hash)
+
+    assert verified
+    assert new_hash.startswith("$argon2id$")
+
+
+def test_calibrate():
+    parameters, elapsed = calibrate(
+        "bcrypt", target=0, samples=1, memory_cost=1024, parallelism=1
+    )
+
+    assert parameters == {"PASSWORD_BCRYPT_ROUNDS": 4}
+    assert elapsed > 0
+
+
+@pytest.mark.asyncio
+async def test_sample_latency(hasher: PasswordHasher):
+    hashed = await hasher.hash("Abc@1234")
+
+    assert hasher.metrics.sample_latency() is None
+
+    await hasher.verify_and_update("Abc@1234", hashed)
+
+    assert hasher.metrics.sample_latency() == hasher.metrics.verify_latencies[0]
+    assert hasher.metrics.sample_latency() > 0
+
+
+@pytest.mark.asyncio
+async def test_hold_rejected_when_queue_full(hasher: PasswordHasher):
+    results = await asyncio.gather(
+        hasher.hold(0.01), hasher.hash("Password#123"), return_exceptions=True
+    )
+
+    assert results[0] is None
+    assert isinstance(results[1], HashingQueueFull)
+    assert hasher.in_flight == 0
@@ -0,0 +1,18 @@
+from app.users.db import User
+from app.users.indexes import document_models, expected_indexes
+from app.users.mail import OutboxMessage
+from app.users.refresh import RefreshToken
+from app.users.revocation import RevokedToken
+
+
+def test_document_models():
+    assert document_models == [User, RevokedToken, RefreshToken, OutboxMessage]
+
+
+def test_expected_indexes():
+    names = expected_indexes(User)
+
+    assert "case_insensitive_email_index" in names
+    assert "created_at" in names
+    assert "unverified_created_at" in names
+    assert len(names) == len(set(names))
@@ -0,0 +1,87 @@
+import pytest
+from datetime import datetime
+from pathlib import Path
+from beanie import PydanticObjectId
+from cryptography.hazmat.primitives import serialization
+from app.users.db import User
+from app.users.keys import JWKS, SigningKeys, generate_private_key
+from app.users.strategy import ClaimsJWTStrategy
+
+
+def write_key(directory: Path, kid: str, algorithm: str) -> None:
+    key = generate_private_key(algorithm)
+    (directory / f"{kid}.pem").write_bytes(
+        key.private_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PrivateFormat.PKCS8,
+            encryption_algorithm=serialization.NoEncryption(),
+        )
+    )
+
+
+@pytest.fixture
+def user() -> User:
+    return User.model_construct(
+        id=PydanticObjectId(),
+        email="keys@example.com",
+        hashed_password="hashed",
+        first_name="John",
+        last_name="Doe",
+        created_at=datetime(2023, 1, 1),
+    )
+
+
+def test_signing_keys_from_directory(tmp_path: Path):
+    write_key(tmp_path, "2023-01", "EdDSA")
+    write_key(tmp_path, "2023-02", "EdDSA")
+
+    signing_keys = SigningKeys.from_directory("EdDSA", tmp_path)
+
+    assert signing_keys.active_kid == "2023-02"
+    assert set(signing_keys.public_keys) == {"2023-01", "2023-02"}
+    assert signing_keys.verification_key("missing") is None
+
+
+def test_signing_keys_unknown_active_kid(tmp_path: Path):
+    write_key(tmp_path, "2023-01", "EdDSA")
+
+    with pytest.raises(ValueError):
+        SigningKeys.from_directory("EdDSA", tmp_path, "missing")
+
+
+def test_jwks(tmp_path: Path):
+    write_key(tmp_path, "2023-01", "RS256")
+    signing_keys = SigningKeys.from_directory("RS256", tmp_path)
+
+    document = signing_keys.jwks()
+    jwks = JWKS(signing_keys)
+
+    assert document["keys"][0]["kid"] == "2023-01"
+    assert document["keys"][0]["kty"] == "RSA"
+    assert document["keys"][0]["alg"] == "RS256"
+    assert "d" not in document["keys"][0]
+    assert jwks.etag == JWKS(signing_keys).etag
+    assert JWKS(None).body == b'{"keys":[]}'
+
+
+@pytest.mark.asyncio
+async def test_strategy_with_signing_keys(tmp_path: Path, user: User):
+    write_key(tmp_path, "2023-01", "EdDSA")
+    old_strategy = ClaimsJWTStrategy(
+        secret="",
+        lifetime_seconds=3600,
+        signing_keys=SigningKeys.from_directory("EdDSA", tmp_path),
+    )
+    old_token = await old_strategy.write_token(user)
+
+    write_key(tmp_path, "2023-02", "EdDSA")
+    strategy = ClaimsJWTStrategy(
+        secret="",
+        lifetime_seconds=3600,
+        signing_keys=SigningKeys.from_directory("EdDSA", tmp_path),
+    )
+    token = await strategy.write_token(user)
+
+    assert (await strategy.decode(token))["sub"] == str(user.id)
+    assert (await strategy.decode(old_token))["sub"] == str(user.id)
+    assert await old_strategy.decode(token) is None
@@ -0,0 +1,58 @@
+import pytest
+from bson import ObjectId
+from datetime import datetime
+from app.users.listing import (
+    InvalidListQuery,
+    build_filter,
+    decode_cursor,
+    encode_cursor,
+    parse_fields,
+)
+
+
+def test_cursor_round_trip() -> None:
+    created_at = datetime(2023, 11, 1, 12, 30, 15, 123000)
+    user_id = ObjectId("654090eac1a115c710f34435")
+
+    cursor = encode_cursor(created_at, user_id)
+
+    assert decode_cursor(cursor) == (created_at, user_id)
+
+
+@pytest.mark.parametrize("cursor", ["", "invalid", encode_cursor(datetime.now(), 1)])
+def test_decode_cursor_invalid(cursor: str) -> None:
+    with pytest.raises(InvalidListQuery):
+        decode_cursor(cursor)
+
+
+def test_parse_fields() -> None:
+    assert parse_fields(None) is None
+    assert parse_fields("email, is_active") == {"id", "email", "is_active"}
+    with pytest.raises(InvalidListQuery):
+        parse_fields("email,hashed_password")
+
+
+def test_build_filter() -> None:
+    after = datetime(2023, 1, 1)
+    created_at = datetime(2023, 11, 1)
+    user_id = ObjectId("654090eac1a115c710f34435")
+
+    query = build_filter(
+        is_active=True,
+        is_verified=False,
+        email_prefix="John.",
+        last_login_after=after,
+        cursor=encode_cursor(created_at, user_id),
+    )
+
+    assert query == {
+        "is_active": True,
+        "is_verified": False,
+        "email": {"$regex": "^John\\.", "$options": "i"},
+        "last_login": {"$gte": after},
+        "$or": [
+            {"created_at": {"$gt": created_at}},
+            {"created_at": created_at, "_id": {"$gt": user_id}},
+        ],
+    }
+    assert build_filter() == {}
@@ -0,0 +1,121 @@
+import pytest
+from datetime import datetime
+from app.users.mail import (
+    RETENTION,
+    TEMPLATES,
+    FileTransport,
+    MailTemplate,
+    MemoryTransport,
+    Outbox,
+    OutboxMessage,
+)
+from pathlib import Path
+from typing import Optional
+
+
+@pytest.fixture
+def outbox() -> Outbox:
+    return Outbox(
+        transport=MemoryTransport(),
+        sender="no-reply@example.com",
+        base_url="https://app.example.com",
+        batch_size=10,
+        poll_interval=1,
+        max_attempts=3,
+        retry_base=30,
+    )
+
+
+def test_mail_template_render():
+    template = MailTemplate("Hello $name", "Open $base_url/verify?token=$token")
+
+    assert template.render(name="John", base_url="https://x", token="abc") == (
+        "Hello John",
+        "Open https://x/verify?token=abc",
+    )
+    with pytest.raises(KeyError):
+        template.render(name="John")
+
+
+@pytest.mark.parametrize("name", TEMPLATES)
+def test_templates_render(name: str):
+    subject, body = TEMPLATES[name].render(
+        name="John", base_url="https://app.example.com", token="abc"
+    )
+
+    assert subject
+    assert body.startswith("Hi John,")
+
+
+def test_outbox_email(outbox: Outbox):
+    message = OutboxMessage.model_construct(
+        to="john@example.com", subject="Reset your password", body="Hi John,\n"
+    )
+
+    email = outbox.email(message)
+
+    assert email["From"] == "no-reply@example.com"
+    assert email["To"] == "john@example.com"
+    assert email["Subject"] == "Reset your password"
+    assert email.get_content() == "Hi John,\n"
+
+
+def test_outbox_retry_delay(outbox: Outbox):
+    assert 15 <= outbox.retry_delay(1) <= 30
+    assert 60 <= outbox.retry_delay(3) <= 120
+
+
+@pytest.mark.parametrize("attempts,status", [(2, "failed"), (0, None)])
+def test_outbox_outcome_failed(outbox: Outbox, attempts: int, status: Optional[str]):
+    message = OutboxMessage.model_construct(id=1, body="token", attempts=attempts)
+    now = datetime(2023, 11, 1)
+
+    update = outbox.outcome(message, "SMTPServerDisconnected()", now)
+
+    assert update.get("status") == status
+    assert update["attempts"] == attempts + 1
+    assert update["last_error"] == "SMTPServerDisconnected()"
+    if status == "failed":
+        assert update["body"] == ""
+        assert update["expires_at"] == now + RETENTION
+    else:
+        assert "expires_at" not in update
+        assert update["next_attempt_at"] > now
+
+
+def test_outbox_outcome_sent(outbox: Outbox):
+    message = OutboxMessage.model_construct(id=1, body="token", attempts=0)
+    now = datetime(2023, 11, 1)
+
+    assert outbox.outcome(message, None, now) == {
+        "status": "sent",
+        "sent_at": now,
+        "body": "",
+        "expires_at": now + RETENTION,
+        "claim": None,
+    }
+    assert outbox.stats()["sent"] == 1
+
+
+@pytest.mark.asyncio
+async def test_memory_transport(outbox: Outbox):
+    transport = MemoryTransport()
+    emails = [
+        outbox.email(OutboxMessage.model_construct(to="a@b.c", subject="s", body="b"))
+    ]
+
+    assert await transport.send(emails) == [None]
+    assert transport.sent == emails
+
+
+@pytest.mark.asyncio
+async def test_file_transport(outbox: Outbox, tmp_path: Path):
+    transport = FileTransport(tmp_path / "mail")
+    email = outbox.email(
+        OutboxMessage.model_construct(to="a@b.c", subject="s", body="b")
+    )
+
+    assert await transport.send([email, email]) == [None, None]
+    files = list((tmp_path / "mail").glob("*.eml"))
+    assert len(files) == 2
+    assert b"To: a@b.c" in files[0].read_bytes()
@@ -1,8 +1,12 @@
 from fastapi import Depends
+from fastapi.security import OAuth2PasswordRequestForm
 from fastapi_users_db_beanie import BeanieUserDatabase
-from fastapi_users import InvalidPasswordException
+from fastapi_users import BaseUserManager, InvalidPasswordException
+from app.config.settings import settings
 from app.users.db import get_user_db
 from app.users.manager import check_password_strength, CustomUserManager
+import hashlib
+import inspect
 import pytest
 from app.users.schemas import UserCreate
 
@@ -111,3 +115,59 @@ async def test_validate_password_weak(user_manager):
         "Password must contain a lowercase letter, uppercase letter, a number and a special symbol"
         in str(exc_info.value.reason)
     )
+
+
+class EmptyUserDatabase:
+    async def get_full_by_email(self, email):
+        return None
+
+
+@pytest.mark.asyncio
+async def test_authenticate_unknown_email_delay(monkeypatch):
+    manager = CustomUserManager(EmptyUserDatabase())
+    credentials = OAuth2PasswordRequestForm(
+        username="unknown@example.com", password="Abc@1234"
+    )
+    completed = manager.password_hasher.metrics.completed
+    monkeypatch.setattr(settings, "LOGIN_UNKNOWN_USER_MODE", "delay")
+
+    # without any latency to mimic yet, the hasher runs
+    monkeypatch.setattr(manager.password_hasher.metrics, "sample_latency", lambda: None)
+    assert await manager.authenticate(credentials) is None
+    assert manager.password_hasher.metrics.completed == completed + 1
+
+    monkeypatch.setattr(manager.password_hasher.metrics, "sample_latency", lambda: 0.01)
+    assert await manager.authenticate(credentials) is None
+    assert manager.password_hasher.metrics.completed == completed + 1
+
+
+@pytest.mark.asyncio
+async def test_authenticate_password_too_long(monkeypatch):
+    manager = CustomUserManager(EmptyUserDatabase())
+    credentials = OAuth2PasswordRequestForm(
+        username="unknown@example.com", password="aA1!" * 1025
+    )
+    completed = manager.password_hasher.metrics.completed
+    monkeypatch.setattr(settings, "LOGIN_UNKNOWN_USER_MODE", "hash")
+
+    assert await manager.authenticate(credentials) is None
+    assert manager.password_hasher.metrics.completed == completed
+
+
+# Digests of the fastapi-users 12.1.2 methods copied by CustomUserManager
+COPIED_METHODS = {
+    "create": "9ea6945bce6ccd45",
+    "authenticate": "d00126280591fe2f",
+    "forgot_password": "5045b21bcee75c1d",
+    "reset_password": "c67e1e47b1766ebd",
+    "_update": "57adcb863cb7f96a",
+}
+
+
+@pytest.mark.parametrize("name,digest", COPIED_METHODS.items())
+def test_base_user_manager_unchanged(name: str, digest: str):
+    source = inspect.getsource(getattr(BaseUserManager, name))
+
+    assert (
+        hashlib.sha256(source.encode()).hexdigest()[:16] == digest
+    ), f"BaseUserManager.{name} changed, update the copy in CustomUserManager"
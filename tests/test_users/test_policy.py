@@ -0,0 +1,73 @@
+import pytest
+from types import SimpleNamespace
+from app.users.policy import (
+    STRENGTH_MESSAGE,
+    PasswordPolicy,
+    PasswordRule,
+    is_strong,
+)
+
+
+@pytest.fixture
+def user():
+    return SimpleNamespace(email="john@example.com", first_name="John", last_name="Doe")
+
+
+@pytest.fixture
+def policy() -> PasswordPolicy:
+    return PasswordPolicy(min_length=8, max_length=64)
+
+
+def test_is_strong():
+    assert is_strong(frozenset("Abc@1234"))
+    assert not is_strong(frozenset("abc@1234"))
+    assert not is_strong(frozenset("Abc@123 4"))
+
+
+def test_validate_valid(policy: PasswordPolicy, user):
+    assert policy.validate("Abc@1234", user) == []
+
+
+def test_validate_returns_all_violations(policy: PasswordPolicy, user):
+    assert policy.validate("doe", user) == [
+        "Password should be at least 8 characters",
+        "Password should not contain last_name",
+        STRENGTH_MESSAGE,
+    ]
+
+
+def test_validate_max_length(policy: PasswordPolicy, user):
+    assert policy.validate("Abc@1234" * 9, user) == [
+        "Password should be at most 64 characters"
+    ]
+
+
+def test_validate_forbidden_substrings_overlapping(policy: PasswordPolicy, user):
+    violations = policy.validate("Abc@1JOHN@EXAMPLE.COM", user)
+
+    assert "Password should not contain e-mail" in violations
+    assert "Password should not contain first_name" in violations
+    assert "Password should not contain last_name" not in violations
+
+
+def test_validate_last_name_without_first_name(policy: PasswordPolicy):
+    user = SimpleNamespace(email="x@example.com", first_name="", last_name="Doe")
+
+    assert policy.validate("Abc@1234Doe", user) == [
+        "Password should not contain last_name"
+    ]
+
+
+def test_validate_rules(user):
+    class NoRepeats(PasswordRule):
+        def check(self, password, user):
+            if len(set(password)) < len(password):
+                return "Password should not repeat characters"
+            return None
+
+    policy = PasswordPolicy(min_length=8, max_length=64, rules=[NoRepeats()])
+
+    assert policy.validate("Abc@1234", user) == []
+    assert policy.validate("Abc@1234A", user) == [
+        "Password should not repeat characters"
+    ]
@@ -0,0 +1,76 @@
+import pytest
+from starlette.requests import Request
+from typing import Optional
+from app.users.ratelimit import (
+    RateLimit,
+    RateLimiter,
+    build_route_limits,
+    client_ip,
+    parse_networks,
+)
+from app.users.store import MemoryStore
+
+
+def test_rate_limit_allows_under_limit():
+    limit = RateLimit("test", limit=10, window=60)
+
+    assert limit.retry_after(previous=0, current=10, now=0) is None
+    # half of the previous window still counts halfway through this one
+    assert limit.retry_after(previous=10, current=5, now=30) is None
+    assert limit.retry_after(previous=10, current=6, now=30) is not None
+
+
+def test_rate_limit_retry_after():
+    limit = RateLimit("test", limit=10, window=60)
+
+    # waits for the previous window to fade out enough for one more request
+    assert limit.retry_after(previous=10, current=6, now=30) == pytest.approx(12)
+    # waits into the next window until this one has faded out enough
+    assert limit.retry_after(previous=0, current=20, now=30) == pytest.approx(63)
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_hit():
+    limiter = RateLimiter(MemoryStore(maxsize=100))
+    per_ip = RateLimit("ip", limit=3, window=60)
+    per_account = RateLimit("account", limit=2, window=60)
+
+    for _ in range(2):
+        assert await limiter.hit([(per_ip, "1.2.3.4"), (per_account, "a")]) is None
+    assert await limiter.hit([(per_ip, "1.2.3.4"), (per_account, "a")]) > 0
+    assert await limiter.hit([(per_ip, "5.6.7.8"), (per_account, "b")]) is None
+    assert limiter.stats() == {"checked": 4, "rejected": 1}
+
+
+def test_build_route_limits():
+    limits = build_route_limits()
+
+    assert [field for _, field in limits["auth:jwt.login"]] == [None, "username"]
+    assert limits["reset:forgot_password"][1][1] == "email"
+
+
+def request(peer: str, forwarded: Optional[str] = None) -> Request:
+    headers = [] if forwarded is None else [(b"x-forwarded-for", forwarded.encode())]
+    return Request({"type": "http", "client": (peer, 1234), "headers": headers})
+
+
+@pytest.mark.parametrize(
+    "peer,forwarded,expected",
+    [
+        # not from a trusted proxy, so the header may be forged
+        ("1.2.3.4", "5.6.7.8", "1.2.3.4"),
+        ("10.0.0.1", None, "10.0.0.1"),
+        ("10.0.0.1", "5.6.7.8", "5.6.7.8"),
+        # the client prepended a forged address; the proxy appended its own
+        ("10.0.0.1", "9.9.9.9, 5.6.7.8", "5.6.7.8"),
+        ("10.0.0.1", "5.6.7.8, 10.0.0.2", "5.6.7.8"),
+    ],
+)
+def test_client_ip(peer: str, forwarded: Optional[str], expected: str):
+    trusted = parse_networks("10.0.0.0/8, ::1")
+
+    assert client_ip(request(peer, forwarded), trusted) == expected
+
+
+def test_client_ip_without_trusted_proxies():
+    assert client_ip(request("10.0.0.1", "5.6.7.8"), []) == "10.0.0.1"
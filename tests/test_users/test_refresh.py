@@ -0,0 +1,16 @@
+from datetime import timedelta
+from app.config.settings import Settings
+from app.users.refresh import hash_refresh_token, refresh_tokens
+
+
+def test_hash_refresh_token():
+    token_hash = hash_refresh_token("token")
+
+    assert token_hash == hash_refresh_token("token")
+    assert token_hash != hash_refresh_token("other-token")
+    assert "token" not in token_hash
+    assert len(token_hash) == 64
+
+
+def test_refresh_tokens_lifetime(settings: Settings):
+    assert refresh_tokens.lifetime == timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
@@ -0,0 +1,41 @@
+import pytest
+from app.config.settings import Settings
+from app.users.revocation import BloomFilter, TokenRevocationList, revocation_list
+
+
+def test_bloom_filter():
+    bloom = BloomFilter(capacity=1000, fp_rate=0.01)
+    for i in range(1000):
+        bloom.add(f"token-{i}")
+
+    assert all(f"token-{i}" in bloom for i in range(1000))
+    false_positives = sum(f"other-{i}" in bloom for i in range(10000))
+    assert false_positives < 300
+    assert bloom.count == 1000
+    assert 0 < bloom.estimated_fp_rate() < 0.03
+
+
+def test_bloom_filter_size():
+    bloom = BloomFilter(capacity=100000, fp_rate=0.001)
+
+    # ~1.44 * log2(1 / fp_rate) bits per item
+    assert 170000 < len(bloom.bits) < 190000
+    assert bloom.hash_count == 10
+
+
+def test_revocation_list_from_settings(settings: Settings):
+    assert revocation_list.capacity == settings.REVOCATION_BLOOM_CAPACITY
+    assert revocation_list.fp_rate == settings.REVOCATION_BLOOM_FP_RATE
+    assert revocation_list.refresh_interval == settings.REVOCATION_REFRESH_SECONDS
+
+
+@pytest.mark.asyncio
+async def test_is_revoked_not_in_bloom():
+    revocations = TokenRevocationList(capacity=10, fp_rate=0.01, refresh_interval=1)
+
+    assert not await revocations.is_revoked("token")
+
+    stats = revocations.stats()
+    assert stats["checks"] == 1
+    assert stats["bloom_positives"] == 0
+    assert stats["items"] == 0
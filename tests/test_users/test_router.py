@@ -1,11 +1,17 @@
 from fastapi.testclient import TestClient
+import asyncio
+import json
 import pytest
+from datetime import datetime
 from typing import Dict
 
 from fastapi_users.jwt import generate_jwt
 from fastapi_users.password import PasswordHelper
 from motor.motor_asyncio import AsyncIOMotorDatabase
 
+from app.config.settings import settings
+from app.users.db import user_cache_stats
+from app.users.mail import outbox
 from app.users.manager import CustomUserManager
 
 
@@ -64,6 +70,23 @@ def test_auth_jwt_login_invalid(client: TestClient, user_data: Dict[str, str]):
     assert response_data["detail"] == "LOGIN_BAD_CREDENTIALS"
 
 
+@pytest.mark.parametrize("mode", ["hash", "delay"])
+@pytest.mark.parametrize("known", [True, False])
+def test_auth_jwt_login_password_too_long(
+    client: TestClient, user_data: Dict[str, str], monkeypatch, mode: str, known: bool
+):
+    monkeypatch.setattr(settings, "LOGIN_UNKNOWN_USER_MODE", mode)
+    data = {
+        "username": user_data["email"] if known else "invalid@example.com",
+        "password": "aA1!" * 1025,
+    }
+
+    response = client.post("/auth/jwt/login", data=data)
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "LOGIN_BAD_CREDENTIALS"
+
+
 def test_auth_jwt_login_valid(client: TestClient, user_data: Dict[str, str]):
     data = {"username": user_data["email"], "password": user_data["password"]}
 
@@ -72,6 +95,7 @@ def test_auth_jwt_login_valid(client: TestClient, user_data: Dict[str, str]):
 
     assert response.status_code == 200
     assert "access_token" in response_data
+    assert "refresh_token" in response_data
     assert "token_type" in response_data
     assert response_data["token_type"] == "bearer"
 
@@ -98,10 +122,86 @@ def test_auth_jwt_logout_valid(client: TestClient, user_data: Dict[str, str]):
     assert response.status_code == 204
 
 
-def test_auth_forgot_password(client: TestClient, user_data: Dict[str, str]):
+def test_auth_jwt_logout_revokes_token(client: TestClient, user_data: Dict[str, str]):
+    data = {"username": user_data["email"], "password": user_data["password"]}
+    access_token = client.post("/auth/jwt/login", data=data).json()["access_token"]
+    headers = {"Authorization": f"Bearer {access_token}"}
+
+    client.post("/auth/jwt/logout", headers=headers)
+    response = client.post("/auth/jwt/logout", headers=headers)
+
+    assert response.status_code == 401
+
+
+def test_auth_jwt_refresh_invalid(client: TestClient):
+    response = client.post("/auth/jwt/refresh", json={"refresh_token": "invalid"})
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "REFRESH_BAD_TOKEN"
+
+
+def test_auth_jwt_refresh_valid(client: TestClient, user_data: Dict[str, str]):
+    data = {"username": user_data["email"], "password": user_data["password"]}
+    refresh_token = client.post("/auth/jwt/login", data=data).json()["refresh_token"]
+
+    response = client.post("/auth/jwt/refresh", json={"refresh_token": refresh_token})
+    response_data = response.json()
+
+    assert response.status_code == 200
+    assert "access_token" in response_data
+    assert response_data["refresh_token"] != refresh_token
+    assert response_data["token_type"] == "bearer"
+
+
+def test_auth_jwt_refresh_reuse(client: TestClient, user_data: Dict[str, str]):
+    data = {"username": user_data["email"], "password": user_data["password"]}
+    refresh_token = client.post("/auth/jwt/login", data=data).json()["refresh_token"]
+
+    rotated = client.post("/auth/jwt/refresh", json={"refresh_token": refresh_token})
+    reused = client.post("/auth/jwt/refresh", json={"refresh_token": refresh_token})
+    after_reuse = client.post(
+        "/auth/jwt/refresh", json={"refresh_token": rotated.json()["refresh_token"]}
+    )
+
+    assert reused.status_code == 400
+    assert after_reuse.status_code == 400
+
+
+def test_jwks(client: TestClient):
+    response = client.get("/.well-known/jwks.json")
+
+    assert response.status_code == 200
+    assert "keys" in response.json()
+    assert "max-age" in response.headers["cache-control"]
+
+    cached_response = client.get(
+        "/.well-known/jwks.json", headers={"If-None-Match": response.headers["etag"]}
+    )
+    assert cached_response.status_code == 304
+
+
+@pytest.mark.asyncio
+async def test_auth_forgot_password(
+    client: TestClient, user_data: Dict[str, str], database: AsyncIOMotorDatabase
+):
     response = client.post("/auth/forgot-password", json={"email": user_data["email"]})
 
     assert response.status_code == 202
+    # the outbox worker sends it through the memory transport
+    for _ in range(50):
+        message = await database["OutboxMessage"].find_one(
+            {"to": user_data["email"], "template": "forgot_password"}
+        )
+        if message is not None and message["status"] == "sent":
+            break
+        await asyncio.sleep(0.1)
+    assert message["status"] == "sent"
+    assert message["body"] == ""
+    assert any(
+        "/reset-password?token=" in email.get_content()
+        for email in outbox.transport.sent
+        if email["To"] == user_data["email"]
+    )
 
 
 def test_auth_reset_password_invalid_token(
@@ -248,6 +348,26 @@ async def test_users_me_get_valid(client: TestClient, user_data: Dict[str, str])
     assert user_res.json()["email"] == data["username"]
 
 
+def test_users_me_get_cached(client: TestClient, user_data: Dict[str, str]):
+    data = {"username": user_data["email"], "password": user_data["password"]}
+    access_token = client.post("/auth/jwt/login", data=data).json()["access_token"]
+    headers = {"Authorization": f"Bearer {access_token}"}
+
+    client.get("/users/me/", headers=headers)
+    hits = user_cache_stats["hits"]
+    misses = user_cache_stats["misses"]
+    user_res = client.get("/users/me/", headers=headers)
+
+    assert user_res.status_code == 200
+    assert user_cache_stats["hits"] == hits + 1
+    assert user_cache_stats["misses"] == misses
+
+    client.patch("/users/me/", headers=headers, json={"first_name": "Cached"})
+    user_res = client.get("/users/me/", headers=headers)
+
+    assert user_res.json()["first_name"] == "Cached"
+
+
 def test_users_me_patch_invalid(client: TestClient, user_data: Dict[str, str]):
     data = {"username": user_data["email"], "password": user_data["password"]}
 
@@ -287,6 +407,28 @@ def test_users_me_patch_valid(client: TestClient, user_data: Dict[str, str]):
     assert user_res.json()["last_name"] == "Musa"
 
 
+@pytest.mark.asyncio
+async def test_users_me_patch_keeps_other_fields(
+    client: TestClient, user_data: Dict[str, str], database: AsyncIOMotorDatabase
+):
+    data = {"username": user_data["email"], "password": user_data["password"]}
+    access_token = client.post("/auth/jwt/login", data=data).json()["access_token"]
+    headers = {"Authorization": f"Bearer {access_token}"}
+    # cache the user as it is now, then change it behind the cache's back
+    client.get("/users/me", headers=headers)
+    last_login = datetime(2023, 11, 1, 12, 0)
+    await database["User"].update_one(
+        {"email": user_data["email"]}, {"$set": {"last_login": last_login}}
+    )
+
+    user_res = client.patch("/users/me", headers=headers, json={"last_name": "Musa"})
+
+    assert user_res.status_code == 200
+    stored = await database["User"].find_one({"email": user_data["email"]})
+    assert stored["last_name"] == "Musa"
+    assert stored["last_login"] == last_login
+
+
 @pytest.mark.asyncio
 async def test_users_get_by_id_invalid(
     client: TestClient,
@@ -504,6 +646,178 @@ async def test_users_delete_by_id_invalid(
     assert response_404.status_code == 404
 
 
+def test_auth_introspect(
+    client: TestClient, superuser_data: Dict[str, str], user_data: Dict[str, str]
+):
+    user_res = client.post(
+        "/auth/jwt/login",
+        data={"username": user_data["email"], "password": user_data["password"]},
+    )
+    user_token = user_res.json()["access_token"]
+
+    response_403 = client.post(
+        "/auth/introspect",
+        json={"token": user_token},
+        headers={"Authorization": f"Bearer {user_token}"},
+    )
+    assert response_403.status_code == 403
+
+    super_res = client.post(
+        "/auth/jwt/login",
+        data={
+            "username": superuser_data["email"],
+            "password": superuser_data["password"],
+        },
+    )
+    super_token = super_res.json()["access_token"]
+    headers = {"Authorization": f"Bearer {super_token}"}
+
+    response = client.post(
+        "/auth/introspect", json={"token": user_token}, headers=headers
+    )
+    assert response.status_code == 200
+    assert response.json()["active"]
+    assert response.json()["username"] == user_data["email"]
+
+    response = client.post(
+        "/auth/introspect",
+        json={"tokens": [user_token, "invalid", super_token]},
+        headers=headers,
+    )
+    results = response.json()["results"]
+    assert response.status_code == 200
+    assert [result["active"] for result in results] == [True, False, True]
+    assert results[1] == {"active": False}
+    assert results[2]["is_superuser"]
+
+
+def test_users_list(
+    client: TestClient, superuser_data: Dict[str, str], user_data: Dict[str, str]
+):
+    login_res = client.post(
+        "/auth/jwt/login",
+        data={
+            "username": superuser_data["email"],
+            "password": superuser_data["password"],
+        },
+    )
+    headers = {"Authorization": f"Bearer {login_res.json()['access_token']}"}
+
+    response = client.get(
+        "/users", params={"limit": 1, "fields": "email"}, headers=headers
+    )
+    assert response.status_code == 200
+    page = response.json()
+    assert len(page["items"]) == 1
+    assert set(page["items"][0]) == {"id", "email"}
+    assert page["next_cursor"] is not None
+
+    response = client.get(
+        "/users",
+        params={"limit": 1, "fields": "email", "cursor": page["next_cursor"]},
+        headers=headers,
+    )
+    next_page = response.json()
+    assert next_page["items"][0]["id"] != page["items"][0]["id"]
+
+    response = client.get(
+        "/users",
+        params={"email_prefix": user_data["email"][:8].upper()},
+        headers=headers,
+    )
+    assert [item["email"] for item in response.json()["items"]] == [user_data["email"]]
+
+    response = client.get("/users", params={"cursor": "invalid"}, headers=headers)
+    assert response.status_code == 400
+
+
+def test_users_import_export(
+    client: TestClient, superuser_data: Dict[str, str], user_data: Dict[str, str]
+):
+    login_res = client.post(
+        "/auth/jwt/login",
+        data={
+            "username": superuser_data["email"],
+            "password": superuser_data["password"],
+        },
+    )
+    headers = {"Authorization": f"Bearer {login_res.json()['access_token']}"}
+    imported = {**user_data, "email": "imported@example.com"}
+    body = "\n".join(
+        [
+            json.dumps(imported),
+            json.dumps({**user_data, "email": user_data["email"].upper()}),
+            "not json",
+        ]
+    )
+
+    response = client.post("/users/import", content=body, headers=headers)
+    assert response.status_code == 200
+    assert response.json()["inserted"] == 1
+    assert [error["line"] for error in response.json()["errors"]] == [2, 3]
+    assert response.json()["errors"][0]["error"] == "REGISTER_USER_ALREADY_EXISTS"
+
+    login_res = client.post(
+        "/auth/jwt/login",
+        data={"username": imported["email"], "password": imported["password"]},
+    )
+    assert login_res.status_code == 200
+
+    response = client.get(
+        "/users/export",
+        params={"format": "csv", "fields": "email", "email_prefix": "imported"},
+        headers=headers,
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert response.text.splitlines()[0] == "id,email"
+    assert response.text.splitlines()[1].endswith(",imported@example.com")
+
+
+@pytest.mark.asyncio
+async def test_users_bulk_action(
+    client: TestClient,
+    superuser_data: Dict[str, str],
+    user_data: Dict[str, str],
+    database: AsyncIOMotorDatabase,
+):
+    login_res = client.post(
+        "/auth/jwt/login",
+        data={
+            "username": superuser_data["email"],
+            "password": superuser_data["password"],
+        },
+    )
+    headers = {"Authorization": f"Bearer {login_res.json()['access_token']}"}
+
+    response = client.post(
+        "/users/bulk",
+        json={"action": "deactivate", "filter": {"email_prefix": "imported"}},
+        headers=headers,
+    )
+    assert response.status_code == 200
+    assert response.json() == {"matched": 1, "modified": 1}
+
+    login_res = client.post(
+        "/auth/jwt/login",
+        data={"username": "imported@example.com", "password": user_data["password"]},
+    )
+    assert login_res.status_code == 400
+
+    imported = await database["User"].find_one({"email": "imported@example.com"})
+    superuser = await database["User"].find_one({"email": superuser_data["email"]})
+    response = client.post(
+        "/users/bulk",
+        json={
+            "action": "delete",
+            "ids": [str(imported["_id"]), str(superuser["_id"])],
+        },
+        headers=headers,
+    )
+    assert response.json() == {"matched": 1, "modified": 1}
+    assert await database["User"].find_one({"_id": imported["_id"]}) is None
+
+
 @pytest.mark.asyncio
 async def test_users_delete_by_id_valid(
     client: TestClient,
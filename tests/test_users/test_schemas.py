@@ -1,6 +1,13 @@
 import pytest
 from datetime import datetime
-from app.users.schemas import UserRead, UserCreate, UserUpdate
+from app.users.schemas import (
+    BulkActionRequest,
+    IntrospectionRequest,
+    UserRead,
+    UserCreate,
+    UserUpdate,
+)
+from pydantic import ValidationError
 from beanie import PydanticObjectId
 
 
@@ -74,3 +81,31 @@ def test_user_update_model_default_values():
     assert user_update.first_name is None
     assert user_update.last_name is None
     assert user_update.password is None
+
+
+def test_introspection_request_model():
+    assert IntrospectionRequest(token="a").token == "a"
+    assert IntrospectionRequest(tokens=["a", "b"]).tokens == ["a", "b"]
+
+    with pytest.raises(ValidationError):
+        IntrospectionRequest()
+    with pytest.raises(ValidationError):
+        IntrospectionRequest(token="a", tokens=["b"])
+    with pytest.raises(ValidationError):
+        IntrospectionRequest(tokens=[])
+
+
+def test_bulk_action_request():
+    ids = ["6549808b53e310b880d3aafa"]
+    assert BulkActionRequest(action="verify", ids=ids).ids == [PydanticObjectId(ids[0])]
+    request = BulkActionRequest(action="deactivate", filter={"is_verified": False})
+    assert request.filter.is_verified is False
+
+    with pytest.raises(ValidationError):
+        BulkActionRequest(action="verify")
+    with pytest.raises(ValidationError):
+        BulkActionRequest(action="verify", ids=ids, filter={"is_active": True})
+    with pytest.raises(ValidationError):
+        BulkActionRequest(action="verify", filter={})
+    with pytest.raises(ValidationError):
+        BulkActionRequest(action="promote", ids=ids)
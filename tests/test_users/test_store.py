@@ -0,0 +1,65 @@
+import time
+import pytest
+from app.config.settings import Settings
+from app.users.store import MemoryStore, RedisStore, get_store
+
+
+@pytest.fixture
+def store() -> MemoryStore:
+    return MemoryStore(maxsize=10)
+
+
+def test_get_store(settings: Settings):
+    store = get_store()
+
+    assert store is get_store()
+    if settings.SHARED_STORE_URL:
+        assert isinstance(store, RedisStore)
+    else:
+        assert isinstance(store, MemoryStore)
+
+
+@pytest.mark.asyncio
+async def test_memory_store_get_set_delete(store: MemoryStore):
+    await store.set_many({"a": "1", "b": "2"})
+    await store.set("c", "3")
+
+    assert await store.get_many(["a", "b", "missing"]) == ["1", "2", None]
+    assert await store.get("c") == "3"
+
+    await store.delete_many(["a", "b"])
+    await store.delete("c")
+
+    assert await store.get_many(["a", "b", "c"]) == [None, None, None]
+
+
+@pytest.mark.asyncio
+async def test_memory_store_ttl(store: MemoryStore):
+    await store.set("a", "1", ttl=0.01)
+    time.sleep(0.02)
+
+    assert await store.get("a") is None
+
+
+@pytest.mark.asyncio
+async def test_memory_store_expired_ttl(store: MemoryStore):
+    await store.set("a", "1")
+    await store.set_many({"a": "2", "b": "2"}, ttl=0)
+
+    assert await store.get_many(["a", "b"]) == [None, None]
+
+
+@pytest.mark.asyncio
+async def test_memory_store_incr_many(store: MemoryStore):
+    assert await store.incr_many(["a", "b"], ttl=60) == [1, 1]
+    assert await store.incr_many(["a"], ttl=60) == [2]
+
+
+@pytest.mark.asyncio
+async def test_memory_store_incr_and_get_many(store: MemoryStore):
+    await store.set("previous", "3")
+
+    assert await store.incr_and_get_many(["current"], ["previous", "missing"]) == (
+        [1],
+        ["3", None],
+    )
@@ -0,0 +1,119 @@
+import pytest
+from datetime import datetime
+from beanie import PydanticObjectId
+from app.users.db import User
+from app.users.schemas import UserRead
+from app.users.strategy import (
+    ClaimsJWTStrategy,
+    mark_user_changed,
+    mark_users_changed,
+)
+
+
+@pytest.fixture
+def user() -> User:
+    return User.model_construct(
+        id=PydanticObjectId(),
+        email="claims@example.com",
+        hashed_password="hashed",
+        first_name="John",
+        last_name="Doe",
+        is_active=True,
+        is_verified=True,
+        is_superuser=False,
+        created_at=datetime(2023, 1, 1),
+        last_login=None,
+    )
+
+
+@pytest.fixture
+def strategy() -> ClaimsJWTStrategy:
+    return ClaimsJWTStrategy(
+        secret="secret",
+        lifetime_seconds=3600,
+        stateless_claims=True,
+        max_staleness_seconds=60,
+        decode_cache_size=10,
+    )
+
+
+@pytest.mark.asyncio
+async def test_read_claims(strategy: ClaimsJWTStrategy, user: User):
+    token = await strategy.write_token(user)
+    user_read = await strategy.read_claims(token)
+
+    assert isinstance(user_read, UserRead)
+    assert user_read.id == user.id
+    assert user_read.email == user.email
+    assert user_read.first_name == user.first_name
+    assert user_read.is_verified
+    assert user_read.created_at == user.created_at
+
+
+@pytest.mark.asyncio
+async def test_read_claims_disabled(user: User):
+    strategy = ClaimsJWTStrategy(secret="secret", lifetime_seconds=3600)
+    token = await strategy.write_token(user)
+
+    assert await strategy.read_claims(token) is None
+
+
+@pytest.mark.asyncio
+async def test_read_claims_invalid_token(strategy: ClaimsJWTStrategy):
+    assert await strategy.read_claims(None) is None
+    assert await strategy.read_claims("invalid") is None
+
+
+@pytest.mark.asyncio
+async def test_read_claims_stale(strategy: ClaimsJWTStrategy, user: User):
+    strategy.max_staleness_seconds = -1
+    token = await strategy.write_token(user)
+
+    assert await strategy.read_claims(token) is None
+
+
+@pytest.mark.asyncio
+async def test_read_claims_user_changed(strategy: ClaimsJWTStrategy, user: User):
+    token = await strategy.write_token(user)
+    await mark_user_changed(str(user.id))
+
+    assert await strategy.read_claims(token) is None
+
+
+@pytest.mark.asyncio
+async def test_read_claims_users_changed(strategy: ClaimsJWTStrategy, user: User):
+    token = await strategy.write_token(user)
+    await mark_users_changed(["654090eac1a115c710f34435", str(user.id)])
+
+    assert await strategy.read_claims(token) is None
+
+
+@pytest.mark.asyncio
+async def test_write_token_jti(strategy: ClaimsJWTStrategy, user: User):
+    first = await strategy.decode(await strategy.write_token(user))
+    second = await strategy.decode(await strategy.write_token(user))
+
+    assert first["sub"] == str(user.id)
+    assert first["jti"] != second["jti"]
+
+
+@pytest.mark.asyncio
+async def test_decode_cache(strategy: ClaimsJWTStrategy, user: User):
+    token = await strategy.write_token(user)
+
+    first = await strategy.decode(token)
+    second = await strategy.decode(token)
+
+    assert first == second
+    assert strategy.decode_cache.stats()["misses"] == 1
+    assert strategy.decode_cache.stats()["hits"] == 1
+    assert await strategy.decode(token[:-2]) is None
+
+
+@pytest.mark.asyncio
+async def test_introspect_invalid_tokens(strategy: ClaimsJWTStrategy):
+    token = strategy._encode({"aud": strategy.token_audience, "jti": "no-subject"})
+
+    results = await strategy.introspect(["invalid", token])
+
+    assert results == [{"active": False}, {"active": False}]
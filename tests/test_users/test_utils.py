@@ -4,12 +4,14 @@ from fastapi_users.authentication import (
     BearerTransport,
     AuthenticationBackend,
 )
+from fastapi import HTTPException
 from app.config.settings import Settings
 from app.users.utils import (
     get_user_manager,
     get_jwt_strategy,
     bearer_transport,
     auth_backend,
+    current_superuser,
     fastapi_users,
 )
 from app.users.manager import CustomUserManager
@@ -30,8 +32,9 @@ def test_get_jwt_strategy(settings: Settings):
     jwt_strategy = get_jwt_strategy()
 
     assert isinstance(jwt_strategy, JWTStrategy)
+    assert jwt_strategy is get_jwt_strategy()
     assert jwt_strategy.secret == settings.SECRET_KEY
-    assert jwt_strategy.lifetime_seconds == 3600
+    assert jwt_strategy.lifetime_seconds == settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
 
 
 def test_auth_backend():
@@ -45,3 +48,11 @@ def test_fastapi_users():
     assert isinstance(fastapi_users, FastAPIUsers)
     assert fastapi_users.get_user_manager == get_user_manager
     assert fastapi_users.authenticator.backends[0] == auth_backend
+
+
+@pytest.mark.asyncio
+async def test_current_superuser_invalid_token():
+    with pytest.raises(HTTPException) as excinfo:
+        await current_superuser("invalid", get_jwt_strategy(), None)
+
+    assert excinfo.value.status_code == 401